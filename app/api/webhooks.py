@@ -1,116 +1,209 @@
 import hmac
 import hashlib
-import json
-from fastapi import APIRouter, Request, HTTPException, BackgroundTasks
+import logging
+import orjson
+from functools import lru_cache
+from fastapi import APIRouter, Request, HTTPException
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ValidationError
+from starlette.concurrency import run_in_threadpool
 from typing import Any, Dict
 from app.core.config import settings
-from app.services.github_service import github_service
+from app.services.github_service import get_github_service
+
+try:
+    import simdjson
+    # Reused across deliveries; handlers run on the event loop thread and
+    # only keep the extracted scalars, never the parsed document
+    _simdjson_parser = simdjson.Parser()
+except ImportError:
+    _simdjson_parser = None
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Events with a handler; everything else is acknowledged without reading the body
+_HANDLED_EVENTS = frozenset(('pull_request', 'ping'))
+
+# The only fields the pull request handler reads, as key paths into the payload
+_PR_EVENT_FIELDS = (('action',),
+                    ('pull_request', 'number'),
+                    ('pull_request', 'head', 'sha'),
+                    ('repository', 'full_name'),
+                    ('installation', 'id'))
+
+
+# GitHub sends signature as 'sha256=<64 hex chars>'
+_SIGNATURE_PREFIX = 'sha256='
+_SIGNATURE_LENGTH = len(_SIGNATURE_PREFIX) + 2 * hashlib.sha256().digest_size
+
+
+@lru_cache(maxsize=4)
+def _hmac_prototype(secret: str) -> hmac.HMAC:
+    """HMAC keyed with the webhook secret; copied per delivery instead of re-keyed"""
+    return hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+
 
 def verify_signature(payload: bytes, signature: str, secret: str) -> bool:
     """Verify GitHub webhook signature"""
     if not signature:
-        print("❌ No signature provided")
+        logger.warning("❌ No signature provided")
         return False
 
-    # GitHub sends signature as 'sha256=<hash>'
-    expected_signature = 'sha256=' + hmac.new(
-        secret.encode('utf-8'),
-        payload,
-        hashlib.sha256
-    ).hexdigest()
+    # Reject malformed headers before doing any HMAC work
+    if len(signature) != _SIGNATURE_LENGTH or not signature.startswith(_SIGNATURE_PREFIX):
+        logger.warning("❌ Malformed signature")
+        return False
+    try:
+        received_digest = bytes.fromhex(signature[len(_SIGNATURE_PREFIX):])
+    except ValueError:
+        logger.warning("❌ Malformed signature")
+        return False
+
+    mac = _hmac_prototype(secret).copy()
+    mac.update(payload)
+    expected_digest = mac.digest()
 
-    is_valid = hmac.compare_digest(expected_signature, signature)
-    print(f"🔐 Signature valid: {is_valid}")
+    is_valid = hmac.compare_digest(expected_digest, received_digest)
+    logger.debug("🔐 Signature valid: %s", is_valid)
     return is_valid
 
 
+class _Commit(BaseModel):
+    sha: str
+
+
+class _PullRequest(BaseModel):
+    number: int
+    head: _Commit
+
+
+class _Repository(BaseModel):
+    full_name: str
+
+
+class _Installation(BaseModel):
+    id: int
+
+
+class PullRequestEvent(BaseModel):
+    """The parts of a pull_request delivery the handler uses; other keys are ignored"""
+    action: str
+    pull_request: _PullRequest
+    repository: _Repository
+    installation: _Installation
+
+
+def _extract_pr_event_fields(payload: bytes) -> Dict[str, Any]:
+    """Read just the PR event fields we use, without materializing the whole payload"""
+    doc = _simdjson_parser.parse(payload)
+    if not isinstance(doc, simdjson.Object):
+        # Drop the proxy first; the traceback would otherwise keep it alive
+        # and block the shared parser
+        del doc
+        raise ValueError("payload is not a JSON object")
+    data = {}
+    for path in _PR_EVENT_FIELDS:
+        value = doc
+        for key in path:
+            value = value.get(key) if isinstance(value, simdjson.Object) else None
+        # Only scalars are kept: object and array proxies become invalid once
+        # the shared parser parses the next delivery. Anything missing or of
+        # the wrong shape is reported by PullRequestEvent validation.
+        if value is None or isinstance(value, (simdjson.Object, simdjson.Array)):
+            continue
+        target = data
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        target[path[-1]] = value
+    return data
+
+
 @router.post("/github")
-async def handle_github_webhook(
-    request: Request,
-    background_tasks: BackgroundTasks
-):
+async def handle_github_webhook(request: Request):
     """Handle GitHub webhook events"""
 
-    print("🚨 WEBHOOK RECEIVED!")
-    print("=" * 50)
+    event_type = request.headers.get('X-GitHub-Event', '')
+    delivery_id = request.headers.get('X-GitHub-Delivery', '')
+
+    # Nothing is done for other events, so skip reading, verifying and parsing them
+    if event_type not in _HANDLED_EVENTS:
+        logger.debug("❓ Unhandled event type: %s (delivery %s)", event_type, delivery_id)
+        return {"message": "Webhook processed successfully"}
 
     # Get request data
     payload = await request.body()
     signature = request.headers.get('X-Hub-Signature-256', '')
-    event_type = request.headers.get('X-GitHub-Event', '')
-    delivery_id = request.headers.get('X-GitHub-Delivery', '')
 
-    print(f"📡 Event Type: {event_type}")
-    print(f"🆔 Delivery ID: {delivery_id}")
-    print(f"📏 Payload Size: {len(payload)} bytes")
-    print(f"🔑 Has Signature: {'Yes' if signature else 'No'}")
-    print(
-        f"🔒 Webhook Secret Set: {'Yes' if settings.github_webhook_secret else 'No'}")
+    logger.debug("📡 Webhook received: event=%s delivery=%s size=%d signed=%s",
+                 event_type, delivery_id, len(payload), 'Yes' if signature else 'No')
 
     # Skip signature verification for debugging (REMOVE THIS LATER!)
     if not settings.github_webhook_secret:
-        print("⚠️  WARNING: No webhook secret set - skipping signature verification")
+        logger.warning("⚠️ No webhook secret set - skipping signature verification")
     elif not verify_signature(payload, signature, settings.github_webhook_secret):
-        print("❌ Signature verification failed")
+        logger.warning("❌ Signature verification failed for delivery %s", delivery_id)
         raise HTTPException(status_code=401, detail="Invalid signature")
 
     # Parse JSON payload
     try:
-        data = json.loads(payload.decode('utf-8'))
-        print(f"✅ JSON parsed successfully")
-    except json.JSONDecodeError as e:
-        print(f"❌ JSON parsing failed: {e}")
+        if event_type == "pull_request" and _simdjson_parser is not None:
+            data = _extract_pr_event_fields(payload)
+        else:
+            # orjson parses the raw bytes, no intermediate decoded str
+            data = orjson.loads(payload)
+        if not isinstance(data, dict):
+            raise ValueError("payload is not a JSON object")
+    except (ValueError, AttributeError, TypeError) as e:
+        logger.warning("❌ JSON parsing failed for delivery %s: %s", delivery_id, e)
         raise HTTPException(status_code=400, detail="Invalid JSON payload")
 
-    # Print some key info from payload
-    if 'repository' in data:
-        print(f"📁 Repository: {data['repository']['full_name']}")
-    if 'pull_request' in data:
-        print(f"🔀 PR Number: {data['pull_request']['number']}")
-        print(f"🎯 PR Action: {data['action']}")
+    # One summary line per delivery
+    logger.info("📡 Webhook event=%s delivery=%s action=%s",
+                event_type, delivery_id, data.get('action'))
 
     # Handle different event types
     if event_type == "pull_request":
-        print("🔄 Processing pull request event...")
-        await handle_pull_request_event(data, background_tasks)
+        if await handle_pull_request_event(data):
+            return ORJSONResponse(status_code=202, content={"message": "Pull request analysis queued"})
     elif event_type == "ping":
-        print("🏓 Ping event received")
         return {"message": "Pong! Webhook is working! 🎉"}
-    else:
-        print(f"❓ Unhandled event type: {event_type}")
 
-    print("=" * 50)
     return {"message": "Webhook processed successfully"}
 
 
-async def handle_pull_request_event(data: Dict[str, Any], background_tasks: BackgroundTasks):
-    """Handle pull request events"""
+async def handle_pull_request_event(data: Dict[str, Any]) -> bool:
+    """Handle pull request events, returning True if an analysis was queued"""
     action = data.get('action')
 
-    print(f"🎬 PR Action: {action}")
-
     # Only process opened and synchronize events
     if action not in ['opened', 'synchronize']:
-        print(f"⏭️  Ignoring PR action: {action}")
-        return
+        logger.debug("⏭️ Ignoring PR action: %s", action)
+        return False
 
     # Extract necessary data
-    pr_number = data['pull_request']['number']
-    repo_name = data['repository']['full_name']
-    installation_id = data['installation']['id']
-
-    print(f"🔄 Processing PR #{pr_number} in {repo_name}")
-    print(f"🏗️  Installation ID: {installation_id}")
-
-    # Process in background to avoid webhook timeout
-    background_tasks.add_task(
-        github_service.analyze_and_comment_on_pr,
-        installation_id,
-        repo_name,
-        pr_number
-    )
-
-    print("✅ Background task queued")
+    try:
+        event = PullRequestEvent.parse_obj(data)
+    except ValidationError as e:
+        logger.warning("❌ Invalid pull request payload: %s", e)
+        raise HTTPException(status_code=400, detail="Invalid pull request payload")
+    pr_number = event.pull_request.number
+    head_sha = event.pull_request.head.sha
+    repo_name = event.repository.full_name
+    installation_id = event.installation.id
+
+    # Usually built already by the startup warm-up; if it is still being built,
+    # wait off the event loop. The models load on the service's own pool, so
+    # this never waits on them
+    github_service = await run_in_threadpool(get_github_service)
+
+    # Process on the service's worker pool to avoid webhook timeout
+    if github_service.submit_pr_analysis(
+            installation_id, repo_name, pr_number, head_sha) is None:
+        # The failed delivery can be redelivered from GitHub once the backlog drains
+        raise HTTPException(status_code=503, detail="Analysis backlog full, retry later")
+
+    logger.info("✅ Queued analysis of PR #%s in %s (installation %s)",
+                pr_number, repo_name, installation_id)
+    return True
@@ -1,6 +1,7 @@
 import os
 from pathlib import Path
-from pydantic import BaseSettings
+from typing import Optional
+from pydantic import BaseSettings, PrivateAttr
 
 
 class Settings(BaseSettings):
@@ -15,7 +16,31 @@ class Settings(BaseSettings):
     # API settings
     api_host: str = "0.0.0.0"
     api_port: int = int(os.getenv("PORT", 8000))  # Railway uses PORT env var
+    # Server processes outside development; each one loads its own analyzers
+    api_workers: int = 1
     environment: str = "development"
+    log_level: str = "INFO"
+
+    # PRs analyzed concurrently in the background
+    max_parallel_analyses: int = 4
+
+    # PRs queued or running before new webhooks are turned away with 503
+    max_queued_analyses: int = 256
+
+    # Optional Redis URL for sharing analyzer results across workers
+    redis_url: str = ""
+
+    # Per-analyzer timings in performance_metrics; disable to skip the clock reads
+    detailed_timing: bool = True
+
+    # Stay silent instead of commenting on PRs with nothing to analyze
+    skip_comment_without_source_changes: bool = False
+
+    # Stop analyzing a PR after this many high-severity findings (0 disables)
+    early_exit_high_severity_count: int = 0
+
+    # Key file contents once read; private so it never shows up in .dict()
+    _private_key_from_file: Optional[str] = PrivateAttr(default=None)
 
     class Config:
         env_file = ".env"
@@ -28,11 +53,13 @@ class Settings(BaseSettings):
         if self.github_private_key_content:
             return self.github_private_key_content
 
-        # Fallback to file (for local development)
-        key_path = Path(self.github_private_key_path)
-        if key_path.exists():
-            return key_path.read_text()
-        return ""
+        # Fallback to file (for local development), read only once
+        if self._private_key_from_file is None:
+            key_path = Path(self.github_private_key_path)
+            if not key_path.exists():
+                return ""
+            self._private_key_from_file = key_path.read_text()
+        return self._private_key_from_file
 
 
 # Global settings instance
@@ -1,47 +1,83 @@
+import logging
+import threading
+import orjson
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.api.webhooks import router as webhook_router
+from fastapi.responses import ORJSONResponse, Response
 from app.core.config import settings
 
+# Configure logging before the service modules are imported and start logging
+logging.basicConfig(
+    level=settings.log_level.upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+from app.api.webhooks import router as webhook_router
+from app.services.github_service import get_github_service
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    logger.info("🚀 Neural Code Review Assistant Starting Up...")
+    logger.info("📱 GitHub App ID: %s", settings.github_app_id)
+    logger.info("🔑 Private Key Path: %s", settings.github_private_key_path)
+    logger.info("🔒 Webhook Secret Set: %s",
+                'Yes' if settings.github_webhook_secret else 'No')
+    logger.info("🌍 Environment: %s", settings.environment)
+    # Build the service in the background so the first delivery finds it ready
+    threading.Thread(target=get_github_service, name="service-warmup", daemon=True).start()
+    yield
+
+
 # Create FastAPI app
 app = FastAPI(
     title="Neural Code Review Assistant",
     description="AI-powered code review bot for GitHub",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Include routers
 app.include_router(webhook_router, prefix="/webhooks", tags=["webhooks"])
 
 
-@app.on_event("startup")
-async def startup_event():
-    print("🚀 Neural Code Review Assistant Starting Up...")
-    print(f"📱 GitHub App ID: {settings.github_app_id}")
-    print(f"🔑 Private Key Path: {settings.github_private_key_path}")
-    print(
-        f"🔒 Webhook Secret Set: {'Yes' if settings.github_webhook_secret else 'No'}")
-    print(f"🌍 Environment: {settings.environment}")
-    print("=" * 50)
+# Probe responses never change while the process runs, so they are
+# serialized once and the same Response is returned on every hit
+_ROOT_RESPONSE = Response(
+    content=orjson.dumps({
+        "message": "Neural Code Review Assistant is running! 🚀",
+        "version": "1.0.0",
+        "status": "healthy"
+    }),
+    media_type="application/json"
+)
+_HEALTH_RESPONSE = Response(
+    content=orjson.dumps({"status": "healthy", "environment": settings.environment}),
+    media_type="application/json"
+)
 
 
 @app.get("/")
 async def root():
-    return {
-        "message": "Neural Code Review Assistant is running! 🚀",
-        "version": "1.0.0",
-        "status": "healthy"
-    }
+    return _ROOT_RESPONSE
 
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "environment": settings.environment}
+    return _HEALTH_RESPONSE
 
 if __name__ == "__main__":
     import uvicorn
+    development = settings.environment == "development"
+    # uvicorn[standard] already picks uvloop and httptools when they're installed
     uvicorn.run(
         "app.main:app",
         host=settings.api_host,
         port=settings.api_port,
-        reload=True if settings.environment == "development" else False
+        reload=development,
+        workers=1 if development else settings.api_workers,
+        access_log=development
     )
@@ -6,6 +6,67 @@ from typing import List, Dict, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+# Enhanced pattern detection, compiled once at import
+_SMART_PATTERN_DEFS = {
+    'logging_vs_print': {
+        'pattern': r'print\s*\(',
+        'count_threshold': 1,
+        'message': "🖨️ Print statements detected. Consider using logging for production code.",
+        'severity': 'info'
+    },
+    'exception_handling': {
+        'pattern': r'except\s*:(?!\s*\n\s*raise)',
+        'count_threshold': 1,
+        'message': "🚫 Broad exception handling detected. Consider catching specific exceptions.",
+        'severity': 'warning'
+    },
+    'todo_fixme': {
+        'pattern': r'#\s*(TODO|FIXME|HACK|XXX)',
+        'count_threshold': 1,
+        'message': "📝 TODO/FIXME comments found. Consider addressing before merging.",
+        'severity': 'info'
+    },
+    'magic_numbers': {
+        'pattern': r'\b(?!0|1|2|10|100|1000)\d{2,}\b',
+        'count_threshold': 3,
+        'message': "🔢 Magic numbers detected. Consider using named constants.",
+        'severity': 'info'
+    },
+    'long_lines': {
+        'pattern': r'.{120,}',
+        'count_threshold': 2,
+        'message': "📏 Long lines detected (>120 chars). Consider breaking for readability.",
+        'severity': 'info'
+    },
+    'deep_nesting_pattern': {
+        'pattern': r'^\s{16,}',  # 4+ levels of indentation
+        'count_threshold': 1,
+        'message': "🪆 Deep nesting detected. Consider extracting methods or early returns.",
+        'severity': 'warning'
+    },
+    'good_practices': {
+        'pattern': r'(with\s+open|logging\.|@\w+|def\s+test_)',
+        'count_threshold': 1,
+        'message': "✨ Good coding practices detected (context managers, logging, decorators, tests).",
+        'severity': 'info'
+    }
+}
+
+_SMART_PATTERNS = [
+    (name, info, re.compile(info['pattern'], re.MULTILINE))
+    for name, info in _SMART_PATTERN_DEFS.items()
+]
+
+_LONG_PARAM_RE = re.compile(r'def\s+\w+\s*\([^)]{80,}\)')
+_FUNCTION_RE = re.compile(r'def\s+(\w+)')
+_EMPTY_EXCEPT_RE = re.compile(r'except[^:]*:\s*pass')
+
+# Complexity keywords, each counted at most once per line
+_COMPLEXITY_INDICATORS = (
+    'if ', 'elif ', 'else:', 'while ', 'for ', 'try:', 'except:',
+    'def ', 'class ', 'with ', 'match ', 'case ', 'lambda'
+)
+
 
 class SmartCodeAnalyzer:
     """Smart code analyzer optimized for resource constraints"""
@@ -78,12 +139,6 @@ class SmartCodeAnalyzer:
         """Calculate complexity without heavy dependencies"""
         lines = [line.strip() for line in code.split('\n') if line.strip()]
 
-        # Count complexity indicators
-        complexity_indicators = [
-            'if ', 'elif ', 'else:', 'while ', 'for ', 'try:', 'except:',
-            'def ', 'class ', 'with ', 'match ', 'case ', 'lambda'
-        ]
-
         complexity_score = 1  # Base complexity
         nesting_depth = 0
         max_nesting = 0
@@ -94,10 +149,9 @@ class SmartCodeAnalyzer:
             nesting_depth = max(nesting_depth, indent_level)
             max_nesting = max(max_nesting, indent_level)
 
-            # Count complexity keywords
-            for indicator in complexity_indicators:
-                if indicator in line.lower():
-                    complexity_score += 1
+            # Count complexity keywords, lowercasing the line once
+            lowered = line.lower()
+            complexity_score += sum(ind in lowered for ind in _COMPLEXITY_INDICATORS)
 
         # Adjust score based on length and nesting
         length_penalty = len(lines) / 20
@@ -117,54 +171,8 @@ class SmartCodeAnalyzer:
         """Smart pattern analysis without heavy models"""
         insights = []
 
-        # Enhanced pattern detection
-        smart_patterns = {
-            'logging_vs_print': {
-                'pattern': r'print\s*\(',
-                'count_threshold': 1,
-                'message': "🖨️ Print statements detected. Consider using logging for production code.",
-                'severity': 'info'
-            },
-            'exception_handling': {
-                'pattern': r'except\s*:(?!\s*\n\s*raise)',
-                'count_threshold': 1,
-                'message': "🚫 Broad exception handling detected. Consider catching specific exceptions.",
-                'severity': 'warning'
-            },
-            'todo_fixme': {
-                'pattern': r'#\s*(TODO|FIXME|HACK|XXX)',
-                'count_threshold': 1,
-                'message': "📝 TODO/FIXME comments found. Consider addressing before merging.",
-                'severity': 'info'
-            },
-            'magic_numbers': {
-                'pattern': r'\b(?!0|1|2|10|100|1000)\d{2,}\b',
-                'count_threshold': 3,
-                'message': "🔢 Magic numbers detected. Consider using named constants.",
-                'severity': 'info'
-            },
-            'long_lines': {
-                'pattern': r'.{120,}',
-                'count_threshold': 2,
-                'message': "📏 Long lines detected (>120 chars). Consider breaking for readability.",
-                'severity': 'info'
-            },
-            'deep_nesting_pattern': {
-                'pattern': r'^\s{16,}',  # 4+ levels of indentation
-                'count_threshold': 1,
-                'message': "🪆 Deep nesting detected. Consider extracting methods or early returns.",
-                'severity': 'warning'
-            },
-            'good_practices': {
-                'pattern': r'(with\s+open|logging\.|@\w+|def\s+test_)',
-                'count_threshold': 1,
-                'message': "✨ Good coding practices detected (context managers, logging, decorators, tests).",
-                'severity': 'info'
-            }
-        }
-
-        for pattern_name, pattern_info in smart_patterns.items():
-            matches = re.findall(pattern_info['pattern'], code, re.MULTILINE)
+        for pattern_name, pattern_info, regex in _SMART_PATTERNS:
+            matches = regex.findall(code)
             if len(matches) >= pattern_info['count_threshold']:
                 insights.append({
                     'type': 'pattern',
@@ -182,8 +190,7 @@ class SmartCodeAnalyzer:
 
         try:
             # Long parameter lists
-            long_param_pattern = r'def\s+\w+\s*\([^)]{80,}\)'
-            if re.search(long_param_pattern, code):
+            if _LONG_PARAM_RE.search(code):
                 insights.append({
                     'type': 'code_smell',
                     'severity': 'info',
@@ -208,8 +215,7 @@ class SmartCodeAnalyzer:
                 })
 
             # Very large functions (estimate)
-            function_pattern = r'def\s+(\w+)'
-            functions = re.findall(function_pattern, code)
+            functions = _FUNCTION_RE.findall(code)
             if len(functions) == 1 and len(code.split('\n')) > 100:
                 insights.append({
                     'type': 'code_smell',
@@ -218,8 +224,7 @@ class SmartCodeAnalyzer:
                 })
 
             # Empty catch blocks
-            empty_except_pattern = r'except[^:]*:\s*pass'
-            if re.search(empty_except_pattern, code):
+            if _EMPTY_EXCEPT_RE.search(code):
                 insights.append({
                     'type': 'code_smell',
                     'severity': 'warning',
@@ -1,14 +1,19 @@
 import os
 import re
 import logging
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import numpy as np
+from sklearn.base import clone
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import hashlib
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Keywords counted (as substrings) by the code statistics complexity density
+_COMPLEXITY_KEYWORDS = ('if', 'for', 'while', 'try', 'def', 'class', 'elif', 'except')
+
 
 class LightweightAIAnalyzer:
     """Lightweight AI analyzer that works on Render free tier"""
@@ -18,6 +23,9 @@ class LightweightAIAnalyzer:
             "USE_LIGHTWEIGHT_TRANSFORMERS", "false").lower() == "true"
         self.model = None
         self.tokenizer = None
+        # Fast tokenizers raise "Already borrowed" when used from two threads
+        # at once, so concurrent batches take turns on the tokenizer and model
+        self._model_lock = threading.Lock()
 
         # Always available: TF-IDF based analysis
         try:
@@ -33,6 +41,7 @@ class LightweightAIAnalyzer:
 
         # Code pattern database (lightweight knowledge base)
         self.code_patterns = self._load_code_patterns()
+        self._pattern_regexes = self._compile_code_patterns(self.code_patterns)
 
         if self.use_transformers:
             self._try_load_lightweight_model()
@@ -135,15 +144,48 @@ class LightweightAIAnalyzer:
             ]
         }
 
+    def _compile_code_patterns(self, patterns: Dict) -> Dict:
+        """Compile the pattern knowledge base once, with the flags each group is scanned with"""
+        def compile_all(group, flags=re.MULTILINE):
+            return [re.compile(pattern, flags) for pattern in group]
+
+        return {
+            'good': compile_all(patterns['quality_patterns']['good'],
+                                re.MULTILINE | re.DOTALL),
+            'bad': compile_all(patterns['quality_patterns']['bad']),
+            'security': compile_all(patterns['security_patterns']),
+            'code_smells': compile_all(patterns['code_smells'])
+        }
+
     def analyze_code_intelligence(self, code: str, filename: str = "") -> List[Dict]:
         """Main AI analysis method"""
+        transformer_insights = None
+        if self.is_transformer_available():
+            transformer_insights = self._analyze_with_transformers(
+                code, filename)
+        return self._analyze_intelligence(code, filename, transformer_insights)
+
+    def analyze_code_intelligence_batch(self, items: List[Tuple[str, str]]) -> List[List[Dict]]:
+        """Analyze several (code, filename) pairs, aligned to input order.
+
+        The transformer runs once over the whole batch; the remaining
+        methods are cheap and still run per item.
+        """
+        transformer_results = [None] * len(items)
+        if items and self.is_transformer_available():
+            transformer_results = self._analyze_with_transformers_batch(
+                [code for code, _ in items])
+        return [self._analyze_intelligence(code, filename, transformer_insights)
+                for (code, filename), transformer_insights in zip(items, transformer_results)]
+
+    def _analyze_intelligence(self, code: str, filename: str,
+                              transformer_insights: Optional[List[Dict]]) -> List[Dict]:
+        """Combine precomputed transformer insights with the other methods"""
         insights = []
 
         try:
             # Method 1: Transformer-based analysis (if available)
-            if self.is_transformer_available():
-                transformer_insights = self._analyze_with_transformers(
-                    code, filename)
+            if transformer_insights:
                 insights.extend(transformer_insights)
 
             # Method 2: TF-IDF based similarity analysis
@@ -177,71 +219,84 @@ class LightweightAIAnalyzer:
 
     def _analyze_with_transformers(self, code: str, filename: str) -> List[Dict]:
         """Analysis using lightweight transformer model"""
-        insights = []
+        return self._analyze_with_transformers_batch([code])[0]
 
+    def _analyze_with_transformers_batch(self, codes: List[str]) -> List[List[Dict]]:
+        """Run the transformer once over a padded batch of code samples"""
         try:
             # Import torch here to avoid import errors
             import torch
 
             # Prepare code for analysis (truncate if too long)
-            code_sample = code[:1000] if len(code) > 1000 else code
-
-            # Tokenize code
-            inputs = self.tokenizer(
-                code_sample,
-                return_tensors="pt",
-                max_length=256,  # Shorter for speed and memory
-                truncation=True,
-                padding=True
-            )
-
-            # Get embeddings
-            with torch.no_grad():
+            code_samples = [code[:1000] for code in codes]
+
+            with self._model_lock, torch.no_grad():
+                # Tokenize code
+                inputs = self.tokenizer(
+                    code_samples,
+                    return_tensors="pt",
+                    max_length=256,  # Shorter for speed and memory
+                    truncation=True,
+                    padding=True
+                )
+
+                # Get embeddings
                 outputs = self.model(**inputs)
-                # Use mean pooling of last hidden states
-                embeddings = outputs.last_hidden_state.mean(dim=1)
+                # Mean pooling over real tokens only, so padding added for
+                # shorter samples in the batch does not skew their embedding
+                mask = inputs['attention_mask'].unsqueeze(-1).to(
+                    outputs.last_hidden_state.dtype)
+                embeddings = (outputs.last_hidden_state * mask).sum(dim=1) / \
+                    mask.sum(dim=1).clamp(min=1)
 
                 # Calculate various metrics from embeddings
-                embedding_norm = torch.norm(embeddings).item()
-                embedding_mean = torch.mean(embeddings).item()
-                embedding_std = torch.std(embeddings).item()
-
-            # Analyze embedding characteristics
-            if embedding_norm > 15:  # High complexity indicator
-                insights.append({
-                    'type': 'ai_complexity',
-                    'severity': 'info',
-                    'message': f'🧠 AI detected high semantic complexity (embedding norm: {embedding_norm:.1f})',
-                    'source': 'transformer_analysis',
-                    'confidence': min(0.9, embedding_norm / 20)
-                })
-
-            if embedding_std > 0.5:  # High variability
-                insights.append({
-                    'type': 'ai_variability',
-                    'severity': 'info',
-                    'message': f'🔀 AI detected high code variability (std: {embedding_std:.2f}) - consider refactoring',
-                    'source': 'transformer_analysis',
-                    'confidence': min(0.8, embedding_std)
-                })
-
-            # Low complexity is also worth noting
-            if embedding_norm < 5 and len(code.split('\n')) > 10:
-                insights.append({
-                    'type': 'ai_simplicity',
-                    'severity': 'info',
-                    'message': f'✨ AI detected well-structured, readable code patterns',
-                    'source': 'transformer_analysis',
-                    'confidence': 0.7
-                })
+                embedding_norms = torch.norm(embeddings, dim=1).tolist()
+                embedding_stds = torch.std(embeddings, dim=1).tolist()
 
         except Exception as e:
             logger.error(f"Transformer analysis failed: {e}")
-            insights.append({
+            return [[{
                 'type': 'transformer_error',
                 'severity': 'info',
                 'message': '⚠️ Advanced AI analysis temporarily unavailable',
                 'source': 'transformer_analysis'
+            }] for _ in codes]
+
+        return [self._transformer_insights(code, norm, std)
+                for code, norm, std in zip(codes, embedding_norms, embedding_stds)]
+
+    def _transformer_insights(self, code: str, embedding_norm: float,
+                              embedding_std: float) -> List[Dict]:
+        """Turn embedding statistics for one sample into insights"""
+        insights = []
+
+        # Analyze embedding characteristics
+        if embedding_norm > 15:  # High complexity indicator
+            insights.append({
+                'type': 'ai_complexity',
+                'severity': 'info',
+                'message': f'🧠 AI detected high semantic complexity (embedding norm: {embedding_norm:.1f})',
+                'source': 'transformer_analysis',
+                'confidence': min(0.9, embedding_norm / 20)
+            })
+
+        if embedding_std > 0.5:  # High variability
+            insights.append({
+                'type': 'ai_variability',
+                'severity': 'info',
+                'message': f'🔀 AI detected high code variability (std: {embedding_std:.2f}) - consider refactoring',
+                'source': 'transformer_analysis',
+                'confidence': min(0.8, embedding_std)
+            })
+
+        # Low complexity is also worth noting
+        if embedding_norm < 5 and len(code.split('\n')) > 10:
+            insights.append({
+                'type': 'ai_simplicity',
+                'severity': 'info',
+                'message': f'✨ AI detected well-structured, readable code patterns',
+                'source': 'transformer_analysis',
+                'confidence': 0.7
             })
 
         return insights
@@ -316,25 +371,25 @@ class LightweightAIAnalyzer:
             # Good patterns analysis
             good_pattern_count = 0
             good_patterns_found = []
-            for pattern in self.code_patterns['quality_patterns']['good']:
-                matches = re.findall(pattern, code, re.MULTILINE | re.DOTALL)
+            for regex in self._pattern_regexes['good']:
+                matches = regex.findall(code)
                 if matches:
                     good_pattern_count += len(matches)
-                    good_patterns_found.append(pattern)
+                    good_patterns_found.append(regex.pattern)
 
             # Bad patterns analysis
             bad_pattern_count = 0
             bad_patterns_found = []
-            for pattern in self.code_patterns['quality_patterns']['bad']:
-                matches = re.findall(pattern, code, re.MULTILINE)
+            for regex in self._pattern_regexes['bad']:
+                matches = regex.findall(code)
                 if matches:
                     bad_pattern_count += len(matches)
-                    bad_patterns_found.append(pattern)
+                    bad_patterns_found.append(regex.pattern)
 
             # Security patterns
             security_pattern_count = 0
-            for pattern in self.code_patterns['security_patterns']:
-                matches = re.findall(pattern, code, re.MULTILINE)
+            for regex in self._pattern_regexes['security']:
+                matches = regex.findall(code)
                 if matches:
                     security_pattern_count += len(matches)
 
@@ -372,8 +427,8 @@ class LightweightAIAnalyzer:
 
             # Code smell detection
             code_smell_count = 0
-            for pattern in self.code_patterns['code_smells']:
-                matches = re.findall(pattern, code, re.MULTILINE)
+            for regex in self._pattern_regexes['code_smells']:
+                matches = regex.findall(code)
                 if matches:
                     code_smell_count += len(matches)
 
@@ -417,11 +472,10 @@ class LightweightAIAnalyzer:
             max_indentation = max(indentations) if indentations else 0
 
             # Complexity indicators
-            complexity_keywords = ['if', 'for', 'while',
-                                   'try', 'def', 'class', 'elif', 'except']
-            complexity_count = sum(1 for line in non_empty_lines
-                                   for keyword in complexity_keywords
-                                   if keyword in line.lower())
+            # Lowercase each line once, not once per keyword
+            complexity_count = sum(keyword in lowered
+                                   for lowered in map(str.lower, non_empty_lines)
+                                   for keyword in _COMPLEXITY_KEYWORDS)
 
             complexity_density = complexity_count / \
                 len(non_empty_lines) if non_empty_lines else 0
@@ -554,7 +608,9 @@ class LightweightAIAnalyzer:
 
             # Use a simple approach if sklearn fails
             try:
-                tfidf_matrix = self.tfidf_vectorizer.fit_transform(all_texts)
+                # Fit a fresh copy so concurrent analyses don't share fitted state
+                tfidf_matrix = clone(
+                    self.tfidf_vectorizer).fit_transform(all_texts)
                 code_vector = tfidf_matrix[-1]
                 pattern_vectors = tfidf_matrix[:-1]
                 similarities = cosine_similarity(
@@ -1,6 +1,7 @@
 import re
 import ast
-from typing import List, Dict, Tuple
+import threading
+from typing import List, Dict, Tuple, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -72,6 +73,64 @@ class AdvancedSecurityScanner:
             }
         }
 
+        # Compile every pattern once instead of on each scan
+        self._compiled_patterns = [
+            (vuln_type, vuln_info, re.compile(
+                pattern, re.IGNORECASE | re.MULTILINE))
+            for vuln_type, vuln_info in self.owasp_patterns.items()
+            for pattern in vuln_info['patterns']
+        ]
+
+        # Optional Hyperscan database that finds every matching pattern in
+        # one pass; only those patterns are then re-run with `re`
+        self._hs_db = self._compile_hyperscan_db()
+        self._hs_lock = threading.Lock()
+
+    def _compile_hyperscan_db(self) -> Optional[object]:
+        """Compile all patterns into one Hyperscan database, if available"""
+        try:
+            import hyperscan
+        except ImportError:
+            return None
+
+        try:
+            db = hyperscan.Database()
+            patterns = [regex.pattern.encode()
+                        for _, _, regex in self._compiled_patterns]
+            db.compile(
+                expressions=patterns,
+                ids=list(range(len(patterns))),
+                elements=len(patterns),
+                flags=[hyperscan.HS_FLAG_CASELESS |
+                       hyperscan.HS_FLAG_SINGLEMATCH] * len(patterns)
+            )
+            logger.info("Hyperscan security pattern database compiled")
+            return db
+        except Exception as e:
+            logger.warning(
+                f"Hyperscan compile failed, using per-pattern regex scan: {e}")
+            return None
+
+    def _matching_pattern_ids(self, content: str) -> Optional[set]:
+        """Indexes of patterns that match somewhere in content, or None if unknown"""
+        if self._hs_db is None:
+            return None
+
+        matched = set()
+
+        def on_match(pattern_id, start, end, flags, context):
+            matched.add(pattern_id)
+
+        try:
+            # A database has a single scratch space, so scans are serialized
+            with self._hs_lock:
+                self._hs_db.scan(content.encode('utf-8', 'replace'),
+                                 match_event_handler=on_match)
+        except Exception as e:
+            logger.error(f"Hyperscan scan failed: {e}")
+            return None
+        return matched
+
     def scan_for_vulnerabilities(self, file_content: str, filename: str) -> List[Dict]:
         """Scan code for security vulnerabilities"""
         vulnerabilities = []
@@ -90,22 +149,23 @@ class AdvancedSecurityScanner:
     def _scan_patterns(self, content: str, filename: str) -> List[Dict]:
         """Scan using regex patterns"""
         vulnerabilities = []
-
-        for vuln_type, vuln_info in self.owasp_patterns.items():
-            for pattern in vuln_info['patterns']:
-                matches = re.finditer(
-                    pattern, content, re.IGNORECASE | re.MULTILINE)
-                for match in matches:
-                    line_num = content[:match.start()].count('\n') + 1
-                    vulnerabilities.append({
-                        'type': vuln_type,
-                        'severity': vuln_info['severity'],
-                        'description': vuln_info['description'],
-                        'line': line_num,
-                        'code_snippet': match.group(0),
-                        'filename': filename,
-                        'recommendation': self._get_recommendation(vuln_type)
-                    })
+        matched_ids = self._matching_pattern_ids(content)
+
+        for pattern_id, (vuln_type, vuln_info, regex) in enumerate(self._compiled_patterns):
+            if matched_ids is not None and pattern_id not in matched_ids:
+                continue
+            for match in regex.finditer(content):
+                # Count newlines in place rather than slicing a copy of the patch
+                line_num = content.count('\n', 0, match.start()) + 1
+                vulnerabilities.append({
+                    'type': vuln_type,
+                    'severity': vuln_info['severity'],
+                    'description': vuln_info['description'],
+                    'line': line_num,
+                    'code_snippet': match.group(0),
+                    'filename': filename,
+                    'recommendation': self._get_recommendation(vuln_type)
+                })
 
         return vulnerabilities
 
@@ -1,128 +1,540 @@
 import jwt
 import time
+import logging
+import hashlib
 import requests
-import os
-from github import Github, GithubIntegration
-from typing import Optional, List, Dict, Any
+import queue
+import threading
+import weakref
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from functools import lru_cache, partial
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from cryptography.hazmat.primitives import serialization
+from github import Github, GithubException, GithubIntegration
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Optional, List, Dict, Any, Tuple
 from app.core.config import settings
 from app.models.code_analyzer import SmartCodeAnalyzer
 from app.models.lightweight_ai_analyzer import LightweightAIAnalyzer
 from app.security.vulnerability_scanner import AdvancedSecurityScanner
+from app.services.result_cache import RedisCacheBackend, result_key
+
+logger = logging.getLogger(__name__)
+
+# Installation tokens live an hour; refresh them 10 minutes before they expire
+_TOKEN_REFRESH_MARGIN_SECONDS = 600
+_TOKEN_DEFAULT_LIFETIME_SECONDS = 3600
+_JWT_REUSE_SECONDS = 9 * 60
+
+_GITHUB_API_URL = "https://api.github.com"
+
+# GitHub's maximum page size; the default of 30 costs extra round-trips per PR
+_GITHUB_PAGE_SIZE = 100
+
+# Pages of a PR's file list fetched at once, per analysis
+_FILE_PAGE_WORKERS = 8
+
+# GitHub lists at most 3000 files for a PR, so later pages are always empty
+_MAX_FILE_PAGES = 30
+
+# Bound on every direct request to api.github.com, so a hung connection
+# cannot hold an installation's token lock forever
+_GITHUB_TIMEOUT_SECONDS = 10
+
+# Idempotent GitHub reads are retried by the client on these statuses
+_GITHUB_RETRY_STATUSES = (502, 503, 504)
+
+# Recently fetched PRs and their files, revalidated with conditional requests
+_PR_CACHE_SIZE = 128
+_PR_CACHE_TTL_SECONDS = 300
+
+# Completed analyses keyed by a digest of the PR's patches
+_ANALYSIS_CACHE_SIZE = 512
+
+# Upper bound on threads running analyzers for a single PR
+_MAX_ANALYZER_WORKERS = 16
+
+# Files with more added lines than this are too large to analyze usefully
+_MAX_ANALYZED_ADDITIONS = 1000
+
+# Patches beyond this many bytes are cut at a line break before analysis
+_MAX_PATCH_BYTES = 64 * 1024
+
+# Files handed to the AI analyzer per call, so the model sees a real batch
+_AI_BATCH_SIZE = 16
+_ANALYZER_LABELS = {'smart': 'Smart', 'security': 'Security'}
+
+# Retry policy for posting comments when GitHub is briefly unavailable
+_COMMENT_RETRY_STATUSES = (502, 503)
+_COMMENT_MAX_ATTEMPTS = 4
+_COMMENT_BACKOFF_SECONDS = 1.0
+
+# Critical findings also posted inline on the diff, as a single review
+_INLINE_REVIEW_LIMIT = 3
+_INLINE_REVIEW_BODY = "🚨 Critical security issues flagged inline by AI Code Review Assistant"
+
+# How many insights and findings of each category the PR comment shows. Only
+# this many are retained; everything else is counted, and per-file entries hold
+# counts rather than copies, so a memoized analysis stays small on huge PRs.
+_AI_INSIGHT_LIMITS = {'complexity': 2, 'pattern': 2}
+_SMART_INSIGHT_LIMITS = {'complexity': 2, 'pattern': 3}
+_SECURITY_FINDING_LIMITS = {'high': 3, 'medium': 2, 'low': 0}
+_SUGGESTION_LIMIT = 3
+
+# Emoji shown next to each analysis mode in the comment header
+_MODE_EMOJIS = {
+    'lightweight_transformers': '🧠',
+    'tfidf_analysis': '📊',
+    'smart_heuristics': '⚡',
+    'security_scanning': '🔒'
+}
+
+# (minimum score, emoji, label), checked from the top; the last tier catches the rest
+_RISK_TIERS = ((7, "🔴", "High Risk"), (4, "🟡", "Medium Risk"), (0, "🟢", "Low Risk"))
+_QUALITY_TIERS = ((7, "🟢"), (4, "🟡"), (0, "🔴"))
+
+# Fixed parts of the PR comment
+_COMMENT_HEADER = "## 🤖 AI Code Review Assistant\n\n"
+_EXCELLENT_WORK_SECTION = (
+    "## ✨ Excellent Work!\n\n"
+    "This PR demonstrates high-quality code with excellent patterns and no security concerns. Keep up the outstanding work! 🎉\n\n"
+)
+_NO_SOURCE_CHANGES_COMMENT = (
+    "## 🤖 AI Code Review Assistant\n\n"
+    "No analyzable source changes detected: this PR only touches binary, "
+    "documentation, lockfile or very large files.\n"
+)
+_COMMENT_FOOTER = (
+    "---\n"
+    "*🤖 Analysis complete: {insights} insights, {security_checks} security checks*\n"
+    "*⚡ Powered by Neural Code Review Assistant*"
+)
+
+# File extensions that are never worth analyzing, and known source languages
+_BINARY_EXTS = frozenset({
+    '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.ico', '.webp', '.pdf',
+    '.zip', '.gz', '.tar', '.jar', '.mp3', '.mp4', '.exe', '.dll', '.so',
+    '.dylib', '.bin', '.woff', '.woff2', '.ttf', '.eot', '.pyc',
+})
+_LANGUAGE_BY_EXT = {
+    '.py': 'Python', '.js': 'JavaScript', '.jsx': 'JavaScript',
+    '.ts': 'TypeScript', '.tsx': 'TypeScript', '.java': 'Java',
+    '.cpp': 'C++', '.c': 'C', '.h': 'C/C++', '.cs': 'C#',
+    '.php': 'PHP', '.rb': 'Ruby', '.go': 'Go', '.rs': 'Rust',
+    '.kt': 'Kotlin', '.swift': 'Swift', '.sql': 'SQL'
+}
+
+# Docs, lockfiles and generated assets that the analyzers have nothing to say about
+_TRIVIAL_SUFFIXES = ('.md', '.lock', '.svg', 'package-lock.json')
+
+
+def _file_extension(filename: str) -> str:
+    """Lower-cased extension with its dot, like os.path.splitext on a repo path"""
+    name = filename.rpartition('/')[2]
+    stem, dot, ext = name.rpartition('.')
+    # No dot, or only leading dots (.gitignore): no extension
+    if not stem.strip('.'):
+        return ''
+    return dot + ext.lower()
+
+
+def _truncate_patch(patch: str) -> Optional[str]:
+    """Cut a patch to _MAX_PATCH_BYTES on a line boundary, or None if it already fits"""
+    # A str never has more characters than its UTF-8 encoding has bytes, nor
+    # more than four bytes per character, so most patches skip the encode
+    if len(patch) * 4 <= _MAX_PATCH_BYTES:
+        return None
+    encoded = patch.encode('utf-8')
+    if len(encoded) <= _MAX_PATCH_BYTES:
+        return None
+    head = encoded[:_MAX_PATCH_BYTES]
+    last_newline = head.rfind(b'\n')
+    if last_newline >= 0:
+        head = head[:last_newline + 1]
+    return head.decode('utf-8', 'ignore')
+
+
+def _is_trivial_patch(filename: str, patch: str) -> bool:
+    """True for docs/lockfile changes and diffs that only add or remove blank lines"""
+    if filename.lower().endswith(_TRIVIAL_SUFFIXES):
+        return True
+    for line in patch.splitlines():
+        # GitHub's patch has hunk headers but no ---/+++ file headers, so
+        # lines like `+++i;` are real changes
+        if line.startswith('@@'):
+            continue
+        if line.startswith(('+', '-')) and line[1:].strip():
+            return False
+    return True
+
+
+def _ai_insight_category(insight_type: str) -> Optional[str]:
+    """AI insight types are grouped by the family named in them"""
+    if 'complexity' in insight_type:
+        return 'complexity'
+    if 'pattern' in insight_type:
+        return 'pattern'
+    return None
+
+
+def _smart_insight_category(insight_type: str) -> str:
+    """Smart insight types already are the category"""
+    return insight_type
+
+
+def _count_high_severity(vulnerabilities: List[Dict]) -> int:
+    """Number of high-severity findings in one file's scan result"""
+    return sum(1 for vuln in vulnerabilities if vuln.get('severity') == 'high')
+
+
+def _new_insight_buckets(limits: Dict[str, int]) -> Dict[str, deque]:
+    """Create one bounded deque per insight category"""
+    return {category: deque(maxlen=limit) for category, limit in limits.items()}
+
+
+@lru_cache(maxsize=16)
+def _render_mode_display(modes: tuple) -> str:
+    """Render the 'Analysis powered by' line for a combination of modes"""
+    return ' + '.join(f"{_MODE_EMOJIS.get(mode, '🔍')} {mode.replace('_', ' ').title()}"
+                      for mode in modes)
+
+
+def _retain(bucket: deque, item: Dict[str, Any]):
+    """Keep the first `maxlen` items of a bucket, like slicing `[:maxlen]`"""
+    if len(bucket) < bucket.maxlen:
+        bucket.append(item)
 
 
 class GitHubService:
-    def __init__(self):
-        """Initialize GitHub service with all AI components"""
-        self.app_id = settings.github_app_id
-        self.private_key = settings.github_private_key
+    def __init__(self, app_id: Optional[int] = None, private_key: Optional[str] = None,
+                 analyzers: Optional[Dict[str, Any]] = None,
+                 result_cache: Optional[RedisCacheBackend] = None,
+                 http: Optional[requests.Session] = None):
+        """Initialize GitHub service with all AI components
+
+        Everything defaults to the app settings. Pass `analyzers` (any of
+        ai_analyzer, code_analyzer, security_scanner) to use those instead of
+        loading the models; analyzers left out are disabled. Otherwise the
+        models load on the analysis pool, so construction stays fast.
+        """
+        self.app_id = settings.github_app_id if app_id is None else app_id
+        self.private_key = settings.github_private_key if private_key is None else private_key
+        self._private_key_obj = self._load_private_key(self.private_key)
 
         # Debug info
-        print(f"🔑 GitHub App ID: {self.app_id}")
-        print(f"🔑 Private key loaded: {'Yes' if self.private_key else 'No'}")
-
-        # Initialize all AI components
-        print("🚀 Initializing AI Components...")
+        logger.info("🔑 GitHub App ID: %s", self.app_id)
+        logger.info("🔑 Private key loaded: %s", 'Yes' if self.private_key else 'No')
+
+        # installation_id -> (token, expires_at epoch), plus the current app JWT
+        self._token_cache = {}
+        self._jwt_cache = None
+        self._token_lock = threading.Lock()  # guards the dicts and the JWT
+        # installation_id -> Lock, so one slow refresh doesn't block other installations
+        self._installation_locks = {}
+        # Direct REST calls (tokens, file pages) share one Session; unlike a
+        # PyGithub client it is safe to use from several threads at once
+        self._http = self._create_http_session() if http is None else http
+
+        # Background workers so webhook handlers can return immediately; the
+        # pool size caps how many PRs are analyzed at once
+        self._pool = ThreadPoolExecutor(
+            max_workers=settings.max_parallel_analyses, thread_name_prefix="pr-analysis")
+        self._in_flight = weakref.WeakValueDictionary()  # (repo, pr, head sha) -> Future
+        self._in_flight_lock = threading.Lock()
+        self._pending_analyses = 0  # queued or running, guarded by _in_flight_lock
+
+        # Loading the models is the pool's first task, so analyses queued behind
+        # it can wait on it without tying up a worker that it needs
+        self.ai_analyzer = self.code_analyzer = self.security_scanner = None
+        if analyzers is None:
+            self._analyzers_loaded = self._pool.submit(self._load_analyzers)
+        else:
+            self._analyzers_loaded = None
+            self._set_analyzers(analyzers)
+
+        # (repo_name, pr_number) -> (etag, files, fetched_at), oldest fetch first
+        self._pr_cache = OrderedDict()
+        self._pr_cache_lock = threading.Lock()
+
+        # Patch digest -> analysis result, least recently used first
+        self._analysis_cache = OrderedDict()
+        self._analysis_cache_lock = threading.Lock()
+        self._analysis_cache_hits = 0
+        self._analysis_cache_misses = 0
+
+        # Per-file analyzer results shared across workers, when Redis is configured
+        self._result_cache = (self._create_result_cache()
+                              if result_cache is None else result_cache)
+
+        # Comments are posted by a single background worker, off the analysis path
+        self._comment_queue = queue.Queue()
+        self._comment_worker = threading.Thread(
+            target=self._drain_comment_queue, name="pr-comments", daemon=True)
+        self._comment_worker.start()
+
+    def _create_http_session(self) -> requests.Session:
+        """Session with pooled keep-alive connections to api.github.com"""
+        session = requests.Session()
+        # Retry only covers idempotent methods, so token POSTs are not repeated
+        session.mount("https://", HTTPAdapter(
+            # Enough keep-alive connections for every analysis to fetch its pages at once
+            pool_maxsize=settings.max_parallel_analyses * _FILE_PAGE_WORKERS,
+            max_retries=Retry(total=3, backoff_factor=0.5,
+                              status_forcelist=_GITHUB_RETRY_STATUSES)))
+        return session
+
+    def _set_analyzers(self, analyzers: Dict[str, Any]):
+        """Use these analyzers; any left out are disabled"""
+        self.ai_analyzer = analyzers.get('ai_analyzer')
+        self.code_analyzer = analyzers.get('code_analyzer')
+        self.security_scanner = analyzers.get('security_scanner')
+
+    def _load_analyzers(self):
+        """Load every analyzer that works in this environment"""
+        logger.info("🚀 Initializing AI Components...")
+        analyzers = {}
 
         try:
             # Lightweight AI analyzer (primary)
-            self.ai_analyzer = LightweightAIAnalyzer()
-            print("✅ Lightweight AI analyzer ready")
+            analyzers['ai_analyzer'] = LightweightAIAnalyzer()
+            logger.info("✅ Lightweight AI analyzer ready")
         except Exception as e:
-            print(f"⚠️ Lightweight AI failed: {e}")
-            self.ai_analyzer = None
+            logger.warning("⚠️ Lightweight AI failed: %s", e)
 
         try:
             # Smart code analyzer (secondary)
-            self.code_analyzer = SmartCodeAnalyzer()
-            print("✅ Smart code analyzer ready")
+            analyzers['code_analyzer'] = SmartCodeAnalyzer()
+            logger.info("✅ Smart code analyzer ready")
         except Exception as e:
-            print(f"⚠️ Smart analyzer failed: {e}")
-            self.code_analyzer = None
+            logger.warning("⚠️ Smart analyzer failed: %s", e)
 
         try:
             # Security scanner (always available)
-            self.security_scanner = AdvancedSecurityScanner()
-            print("✅ Security scanner ready")
+            analyzers['security_scanner'] = AdvancedSecurityScanner()
+            logger.info("✅ Security scanner ready")
+        except Exception as e:
+            logger.warning("⚠️ Security scanner failed: %s", e)
+
+        self._set_analyzers(analyzers)
+        logger.info("🎉 All analyzers initialized!")
+
+    def _create_result_cache(self) -> Optional[RedisCacheBackend]:
+        """Connect the shared result cache if a Redis URL is configured"""
+        if not settings.redis_url:
+            return None
+        try:
+            backend = RedisCacheBackend(settings.redis_url)
+            backend.ping()
+            logger.info("✅ Redis result cache enabled")
+            return backend
+        except ImportError:
+            logger.warning("📦 redis package not available, using in-process caching only")
         except Exception as e:
-            print(f"⚠️ Security scanner failed: {e}")
-            self.security_scanner = None
+            logger.warning("⚠️ Redis result cache unavailable: %s", e)
+        return None
 
-        print("🎉 All analyzers initialized!")
+    def _load_private_key(self, pem: str):
+        """Parse the PEM once so signing JWTs skips re-importing the key"""
+        if not pem:
+            return None
+        try:
+            return serialization.load_pem_private_key(pem.encode(), password=None)
+        except Exception as e:
+            logger.warning("⚠️ Could not parse GitHub private key: %s", e)
+            return None
 
     def get_installation_access_token(self, installation_id: int) -> str:
-        """Get access token for a specific installation"""
+        """Get access token for a specific installation, reusing it until near expiry"""
         if not self.private_key:
             raise ValueError("GitHub private key not found!")
 
+        cached = self._token_cache.get(installation_id)
+        if cached is not None and cached[1] - time.time() > _TOKEN_REFRESH_MARGIN_SECONDS:
+            return cached[0]
+
+        with self._token_lock:
+            installation_lock = self._installation_locks.setdefault(
+                installation_id, threading.Lock())
+
+        # Only one thread refreshes a given installation; the rest wait and reuse it
+        with installation_lock:
+            cached = self._token_cache.get(installation_id)
+            if cached is not None and cached[1] - time.time() > _TOKEN_REFRESH_MARGIN_SECONDS:
+                return cached[0]
+
+            with self._token_lock:
+                app_jwt = self._get_app_jwt()
+
+            # Get installation access token
+            headers = {
+                'Authorization': f'Bearer {app_jwt}',
+                'Accept': 'application/vnd.github.v3+json'
+            }
+
+            url = f'{_GITHUB_API_URL}/app/installations/{installation_id}/access_tokens'
+            try:
+                response = self._http.post(
+                    url, headers=headers, timeout=_GITHUB_TIMEOUT_SECONDS)
+                response.raise_for_status()
+                data = response.json()
+            except Exception as e:
+                logger.error("❌ Failed to get installation token: %s", e)
+                raise
+
+            token = data['token']
+            expires_at = data.get('expires_at')
+            expires_epoch = (datetime.strptime(expires_at, "%Y-%m-%dT%H:%M:%SZ")
+                             .replace(tzinfo=timezone.utc).timestamp()
+                             if expires_at else time.time() + _TOKEN_DEFAULT_LIFETIME_SECONDS)
+            self._token_cache[installation_id] = (token, expires_epoch)
+            return token
+
+    def _get_app_jwt(self) -> str:
+        """App JWT for GitHub App authentication; callers hold _token_lock"""
+        now = time.time()
+        if self._jwt_cache is not None and self._jwt_cache[1] > now:
+            return self._jwt_cache[0]
+
         # Create JWT for GitHub App authentication
         payload = {
-            'iat': int(time.time()) - 60,
-            'exp': int(time.time()) + (10 * 60),
-            'iss': self.app_id
+            'iat': int(now) - 60,
+            'exp': int(now) + (10 * 60),
+            'iss': str(self.app_id)
         }
 
         try:
             jwt_token = jwt.encode(
-                payload, self.private_key, algorithm='RS256')
-            print(f"🎫 JWT token created successfully")
+                payload, self._private_key_obj or self.private_key, algorithm='RS256')
+            logger.debug("🎫 JWT token created successfully")
         except Exception as e:
-            print(f"❌ Failed to create JWT token: {e}")
+            logger.error("❌ Failed to create JWT token: %s", e)
             raise
 
-        # Get installation access token
-        headers = {
-            'Authorization': f'Bearer {jwt_token}',
-            'Accept': 'application/vnd.github.v3+json'
-        }
-
-        url = f'https://api.github.com/app/installations/{installation_id}/access_tokens'
-        try:
-            response = requests.post(url, headers=headers)
-            response.raise_for_status()
-            return response.json()['token']
-        except Exception as e:
-            print(f"❌ Failed to get installation token: {e}")
-            raise
+        # GitHub accepts it for 10 minutes; stop handing it out a minute early
+        self._jwt_cache = (jwt_token, now + _JWT_REUSE_SECONDS)
+        return jwt_token
 
     def get_github_client(self, installation_id: int) -> Github:
-        """Get authenticated GitHub client for installation"""
+        """Get a new authenticated GitHub client for installation
+
+        PyGithub clients are not thread-safe, so each one stays on the thread
+        that created it; the access token behind it is cached.
+        """
         access_token = self.get_installation_access_token(installation_id)
-        return Github(access_token)
+        return Github(access_token, per_page=_GITHUB_PAGE_SIZE,
+                      retry=Retry(total=3, backoff_factor=0.5,
+                                  status_forcelist=_GITHUB_RETRY_STATUSES))
+
+    def _api_headers(self, token: str) -> Dict[str, str]:
+        """Headers for direct REST calls made with an installation token"""
+        return {'Authorization': f'token {token}',
+                'Accept': 'application/vnd.github.v3+json'}
+
+    def submit_pr_analysis(self, installation_id: int, repo_name: str,
+                           pr_number: int, head_sha: str) -> Optional[Future]:
+        """Queue a PR for background analysis, ignoring duplicates already in flight
+
+        Only the same head commit counts as a duplicate (a redelivery); a new
+        push is always analyzed. Returns None without queueing when the
+        backlog is full.
+        """
+        key = (repo_name, pr_number, head_sha)
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            if future is not None and not future.done():
+                logger.info("⏭️ PR #%s in %s at %s is already being analyzed",
+                            pr_number, repo_name, head_sha[:7])
+                return future
+
+            if self._pending_analyses >= settings.max_queued_analyses:
+                logger.warning("🚦 Analysis backlog full (%d PRs), rejecting PR #%s in %s",
+                               self._pending_analyses, pr_number, repo_name)
+                return None
+
+            future = self._pool.submit(
+                self.analyze_and_comment_on_pr, installation_id, repo_name, pr_number)
+            self._in_flight[key] = future
+            self._pending_analyses += 1
+
+        # Outside the lock: the callback runs right away if the future already finished
+        future.add_done_callback(self._analysis_finished)
+        return future
+
+    def _analysis_finished(self, future: Future):
+        """Free a backlog slot once an analysis completes or is cancelled"""
+        with self._in_flight_lock:
+            self._pending_analyses -= 1
+
+    def _drain_comment_queue(self):
+        """Post queued PR comments one at a time for the lifetime of the process"""
+        while True:
+            installation_id, repo_name, pr_number, body, review_comments = \
+                self._comment_queue.get()
+            try:
+                # A client of this thread's own; the lazy repo costs no request
+                repo = self.get_github_client(installation_id).get_repo(repo_name, lazy=True)
+                pr = repo.get_pull(pr_number)
+                self._call_with_retry(pr, pr.create_issue_comment, body)
+                if review_comments:
+                    self._call_with_retry(pr, pr.create_review, body=_INLINE_REVIEW_BODY,
+                                          event="COMMENT", comments=review_comments)
+            except Exception as e:
+                logger.error("❌ Failed to post comment on PR #%s in %s: %s",
+                             pr_number, repo_name, e)
+            finally:
+                self._comment_queue.task_done()
+
+    def _call_with_retry(self, pr, method, *args, **kwargs):
+        """Call a PR write method, backing off exponentially on transient GitHub errors"""
+        for attempt in range(_COMMENT_MAX_ATTEMPTS):
+            try:
+                return method(*args, **kwargs)
+            except GithubException as e:
+                if e.status not in _COMMENT_RETRY_STATUSES or attempt == _COMMENT_MAX_ATTEMPTS - 1:
+                    raise
+                delay = _COMMENT_BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning("⏳ GitHub returned %s for PR #%s, retrying in %.0fs",
+                               e.status, pr.number, delay)
+                time.sleep(delay)
 
     def analyze_and_comment_on_pr(self, installation_id: int, repo_name: str, pr_number: int):
         """Main function to analyze PR and post comment"""
         try:
-            print(
-                f"🔍 Starting comprehensive analysis for PR #{pr_number} in {repo_name}")
-
-            # Get GitHub client
-            github_client = self.get_github_client(installation_id)
-            repo = github_client.get_repo(repo_name)
-            pr = repo.get_pull(pr_number)
+            logger.info("🔍 Starting comprehensive analysis for PR #%s in %s",
+                        pr_number, repo_name)
 
             # Get PR files and changes
-            files = list(pr.get_files())
-            print(f"📁 Analyzing {len(files)} changed files")
-
-            # Comprehensive analysis
-            analysis_result = self._analyze_pr_changes_comprehensive(files)
+            files = self._get_pr_files(installation_id, repo_name, pr_number)
+            logger.info("📁 Analyzing %d changed files", len(files))
+
+            # Asset-only, lockfile-only or oversized PRs give the analyzers nothing to do
+            if not any(self._is_analyzable(file) for file in files):
+                logger.info("⏭️ PR #%s has no analyzable source changes", pr_number)
+                if not settings.skip_comment_without_source_changes:
+                    self._comment_queue.put(
+                        (installation_id, repo_name, pr_number, _NO_SOURCE_CHANGES_COMMENT, []))
+                return
+
+            # Comprehensive analysis, once the models have finished loading
+            if self._analyzers_loaded is not None:
+                self._analyzers_loaded.result()
+            analysis_result = self._analyze_pr_changes_memoized(files)
 
             # Generate and post comment
             comment_body = self._generate_comprehensive_comment(
                 analysis_result)
-            pr.create_issue_comment(comment_body)
+            review_comments = self._build_review_comments(analysis_result)
+            self._comment_queue.put(
+                (installation_id, repo_name, pr_number, comment_body, review_comments))
 
-            print(f"✅ Comprehensive analysis complete for PR #{pr_number}")
+            logger.info("✅ Comprehensive analysis complete for PR #%s", pr_number)
 
         except Exception as e:
-            print(f"❌ Error in analysis: {str(e)}")
+            logger.exception("❌ Error in analysis: %s", e)
             # Post a simple error comment instead of failing silently
-            try:
-                github_client = self.get_github_client(installation_id)
-                repo = github_client.get_repo(repo_name)
-                pr = repo.get_pull(pr_number)
-
-                error_comment = f"""## 🤖 AI Code Review Assistant
+            error_comment = f"""## 🤖 AI Code Review Assistant
 
 ⚠️ **Analysis temporarily unavailable**
 
@@ -136,15 +548,116 @@ I encountered an issue while analyzing this PR. The development team has been no
 ---
 *🔧 Error ID: {str(e)[:50]}...*"""
 
-                pr.create_issue_comment(error_comment)
-            except:
-                pass
+            self._comment_queue.put((installation_id, repo_name, pr_number, error_comment, []))
 
             raise
 
-    def _analyze_pr_changes_comprehensive(self, files: List[Any]) -> Dict[str, Any]:
+    def _get_pr_files(self, installation_id: int, repo_name: str,
+                      pr_number: int) -> List[Dict[str, Any]]:
+        """Fetch a PR's files, reusing a cached copy if GitHub reports the PR unchanged"""
+        token = self.get_installation_access_token(installation_id)
+        key = (repo_name, pr_number)
+        with self._pr_cache_lock:
+            cached = self._pr_cache.get(key)
+
+        headers = self._api_headers(token)
+        if (cached is not None and cached[0]
+                and time.monotonic() - cached[2] < _PR_CACHE_TTL_SECONDS):
+            # A 304 does not count against the rate limit
+            headers['If-None-Match'] = cached[0]
+        response = self._http.get(f"{_GITHUB_API_URL}/repos/{repo_name}/pulls/{pr_number}",
+                                  headers=headers, timeout=_GITHUB_TIMEOUT_SECONDS)
+        if response.status_code == 304 and 'If-None-Match' in headers:
+            logger.info("♻️ PR #%s unchanged, reusing cached files", pr_number)
+            self._cache_pr_files(key, cached[0], cached[1])
+            return cached[1]
+        response.raise_for_status()
+
+        files = self._preload_files(token, repo_name, pr_number,
+                                    response.json()['changed_files'])
+
+        self._cache_pr_files(key, response.headers.get('ETag'), files)
+        return files
+
+    def _cache_pr_files(self, key: Tuple[str, int], etag: Optional[str],
+                        files: List[Dict[str, Any]]):
+        """Remember a just fetched or revalidated PR, dropping expired and excess entries"""
+        now = time.monotonic()
+        with self._pr_cache_lock:
+            self._pr_cache[key] = (etag, files, now)
+            self._pr_cache.move_to_end(key)
+            # Entries are kept in fetch order, so the expired ones are at the front
+            while self._pr_cache and (
+                    len(self._pr_cache) > _PR_CACHE_SIZE
+                    or now - next(iter(self._pr_cache.values()))[2] >= _PR_CACHE_TTL_SECONDS):
+                self._pr_cache.popitem(last=False)
+
+    def _preload_files(self, token: str, repo_name: str, pr_number: int,
+                       changed_files: int) -> List[Dict[str, Any]]:
+        """Read every changed file once into plain dicts for the analysis loops"""
+        # The PR already says how many files changed, so every page can be
+        # requested at once instead of following next links one by one
+        page_count = min(_MAX_FILE_PAGES, max(1, -(-changed_files // _GITHUB_PAGE_SIZE)))
+        get_page = partial(self._get_files_page, token, repo_name, pr_number)
+        if page_count == 1:
+            pages = [get_page(1)]
+        else:
+            with ThreadPoolExecutor(max_workers=min(_FILE_PAGE_WORKERS, page_count)) as executor:
+                pages = list(executor.map(get_page, range(1, page_count + 1)))
+
+        return [{'filename': f['filename'], 'patch': f.get('patch') or '',
+                 'additions': f['additions'], 'deletions': f['deletions'], 'sha': f['sha']}
+                for page in pages for f in page]
+
+    def _get_files_page(self, token: str, repo_name: str, pr_number: int,
+                        page: int) -> List[Dict[str, Any]]:
+        """One page (1-based) of a PR's changed files, as GitHub's JSON"""
+        response = self._http.get(
+            f"{_GITHUB_API_URL}/repos/{repo_name}/pulls/{pr_number}/files",
+            headers=self._api_headers(token),
+            params={'per_page': _GITHUB_PAGE_SIZE, 'page': page},
+            timeout=_GITHUB_TIMEOUT_SECONDS)
+        response.raise_for_status()
+        return response.json()
+
+    def _analyze_pr_changes_memoized(self, files: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Reuse the analysis of an identical set of patches (redeliveries, re-triggers)"""
+        digest = hashlib.blake2b(digest_size=16)
+        for file in files:
+            digest.update(
+                f"{file['filename']}\0{file['additions']}\0{file['deletions']}\0".encode())
+            digest.update(file['patch'].encode('utf-8', 'replace'))
+            digest.update(b"\0")
+        key = digest.hexdigest()
+
+        with self._analysis_cache_lock:
+            cached = self._analysis_cache.get(key)
+            if cached is not None:
+                self._analysis_cache.move_to_end(key)
+                self._analysis_cache_hits += 1
+            else:
+                self._analysis_cache_misses += 1
+            hits, misses = self._analysis_cache_hits, self._analysis_cache_misses
+
+        logger.info("🗃️ Analysis cache %s (%d hits / %d misses)",
+                    'hit' if cached is not None else 'miss', hits, misses)
+        if cached is not None:
+            return cached
+
+        analysis = self._analyze_pr_changes_comprehensive(files)
+        # A failed analyzer or an early exit leaves gaps that a retry can fill
+        metrics = analysis['performance_metrics']
+        if metrics['early_exit'] or metrics['missing_results']:
+            return analysis
+        with self._analysis_cache_lock:
+            self._analysis_cache[key] = analysis
+            while len(self._analysis_cache) > _ANALYSIS_CACHE_SIZE:
+                self._analysis_cache.popitem(last=False)
+        return analysis
+
+    def _analyze_pr_changes_comprehensive(self, files: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Comprehensive analysis using all available analyzers"""
-        print("🧠 Running comprehensive analysis...")
+        logger.debug("🧠 Running comprehensive analysis...")
 
         # Initialize analysis results
         analysis = {
@@ -152,19 +665,29 @@ I encountered an issue while analyzing this PR. The development team has been no
             'languages': set(),
             'total_additions': 0,
             'total_deletions': 0,
-            'ai_insights': [],
-            'smart_insights': [],
-            'security_vulnerabilities': [],
+            'ai_insights': _new_insight_buckets(_AI_INSIGHT_LIMITS),
+            'smart_insights': _new_insight_buckets(_SMART_INSIGHT_LIMITS),
+            'ai_insight_count': 0,
+            'smart_insight_count': 0,
+            'security_vulnerability_count': 0,
+            'security_severity_counts': dict.fromkeys(_SECURITY_FINDING_LIMITS, 0),
+            'security_vulnerabilities_by_severity': _new_insight_buckets(_SECURITY_FINDING_LIMITS),
+            'inline_review_findings': deque(maxlen=_INLINE_REVIEW_LIMIT),
             'complexity_analysis': {},
-            'suggestions': [],
+            'suggestions': deque(maxlen=_SUGGESTION_LIMIT),
             'code_quality_score': 0,
             'analysis_modes': [],
             'file_analysis': {},
-            'overall_risk_score': 0
+            'overall_risk_score': 0,
+            'performance_metrics': {'ai_ms': 0, 'smart_ms': 0, 'security_ms': 0,
+                                    'trivial_files_skipped': 0, 'cache_hits': 0,
+                                    'early_exit': False, 'missing_results': 0}
         }
 
         # Determine available analysis modes
-        if self.ai_analyzer and self.ai_analyzer.is_ai_available():
+        ai_available = bool(
+            self.ai_analyzer and self.ai_analyzer.is_ai_available())
+        if ai_available:
             if self.ai_analyzer.is_transformer_available():
                 analysis['analysis_modes'].append('lightweight_transformers')
             analysis['analysis_modes'].append('tfidf_analysis')
@@ -179,115 +702,224 @@ I encountered an issue while analyzing this PR. The development team has been no
         analyzed_files = 0
         high_risk_files = 0
 
-        # Analyze each file
+        # First pass: cheap per-file bookkeeping and deciding what to analyze
+        eligible_files = []
+        languages = analysis['languages']
+        file_analyses = analysis['file_analysis']
+        total_additions = total_deletions = trivial_files = truncated_files = 0
         for file in files:
-            print(f"🔍 Analyzing {file.filename}...")
+            filename = file['filename']
+            additions = file['additions']
+            logger.debug("🔍 Analyzing %s...", filename)
 
-            # Language detection
-            file_ext = file.filename.split(
-                '.')[-1].lower() if '.' in file.filename else ''
-            language = self._detect_language(file.filename, file_ext)
+            # Language and binary detection from a single extension lookup
+            language, is_binary = self._classify_file(filename)
             if language:
-                analysis['languages'].add(language)
+                languages.add(language)
 
             # Count changes
-            analysis['total_additions'] += file.additions
-            analysis['total_deletions'] += file.deletions
+            total_additions += additions
+            total_deletions += file['deletions']
+
+            # Skip binary files, very large files, or files without patches;
+            # the cheap flags go first so skipped files never touch the patch
+            patch = None if is_binary or additions > _MAX_ANALYZED_ADDITIONS else file['patch']
+            if not patch:
+                logger.debug(
+                    "⏭️ Skipping %s (binary, too large, or no patch)", filename)
+                continue
 
-            # Skip binary files, very large files, or files without patches
-            if not file.patch or file.additions > 1000 or self._is_binary_file(file.filename):
-                print(
-                    f"⏭️ Skipping {file.filename} (binary, too large, or no patch)")
+            # Docs and blank-line-only changes never need the analyzers
+            if _is_trivial_patch(filename, patch):
+                logger.debug("⏭️ Skipping %s (docs or blank lines only)", filename)
+                trivial_files += 1
+                file_analyses[filename] = {
+                    'filename': filename,
+                    'language': language,
+                    'additions': additions,
+                    'deletions': file['deletions'],
+                    'trivial': True,
+                    'insight_count': 0,
+                    'vulnerability_count': 0,
+                    'complexity': {},
+                    'risk_score': 0
+                }
                 continue
 
+            # Bound analyzer memory and tokenization cost on huge patches
+            truncated = _truncate_patch(patch)
+            if truncated is not None:
+                logger.debug("✂️ Truncating %s to %d bytes", filename, _MAX_PATCH_BYTES)
+                file = {**file, 'patch': truncated, 'truncated': True}
+                truncated_files += 1
+
+            eligible_files.append((file, language))
+
+        analysis['total_additions'] = total_additions
+        analysis['total_deletions'] = total_deletions
+        analysis['performance_metrics']['trivial_files_skipped'] = trivial_files
+        analysis['performance_metrics']['truncated_files'] = truncated_files
+
+        # Fan the analyzers out across files; they are independent of each other.
+        # The AI analyzer takes files in batches, the others one file at a time.
+        kinds = []
+        if self.code_analyzer:
+            kinds.append('smart')
+        if self.security_scanner:
+            kinds.append('security')
+
+        metrics = analysis['performance_metrics']
+
+        # Byte-identical patches (renames, bulk refactors) are analyzed once
+        # per extension, since the scanners treat extensions differently
+        representatives = {}
+        duplicates = []  # (filename, representative filename)
+        for file, _ in eligible_files:
+            patch_key = (
+                hashlib.blake2b(file['patch'].encode('utf-8', 'replace'),
+                                digest_size=16).digest(),
+                _file_extension(file['filename'])
+            )
+            representative = representatives.setdefault(patch_key, file)
+            if representative is not file:
+                duplicates.append(
+                    (file['filename'], representative['filename']))
+        eligible = list(representatives.values())
+        metrics['duplicate_patches'] = len(duplicates)
+
+        # Results another worker already computed for the same patches
+        results = self._load_shared_results(
+            eligible, (['ai'] if ai_available else []) + kinds)
+        metrics['cache_hits'] = len(results)
+
+        tasks = [(self._run_analyzer, kind, file)
+                 for file in eligible for kind in kinds
+                 if (file['filename'], kind) not in results]
+        if ai_available:
+            pending_ai = [file for file in eligible
+                          if (file['filename'], 'ai') not in results]
+            tasks.extend((self._run_ai_batch, pending_ai[i:i + _AI_BATCH_SIZE])
+                         for i in range(0, len(pending_ai), _AI_BATCH_SIZE))
+        # Once this many high-severity findings are in, the PR is blocked anyway
+        early_exit_at = settings.early_exit_high_severity_count
+        high_severity = sum(_count_high_severity(result)
+                            for (_, kind), result in results.items() if kind == 'security')
+        if early_exit_at and high_severity >= early_exit_at:
+            tasks = []
+            metrics['early_exit'] = True
+
+        fresh_results = {}
+        elapsed_ns = {'ai': 0, 'smart': 0, 'security': 0}
+        if tasks:
+            with ThreadPoolExecutor(max_workers=min(_MAX_ANALYZER_WORKERS, len(tasks))) as executor:
+                futures = [executor.submit(*task) for task in tasks]
+                for future in as_completed(futures):
+                    kind, file_results, duration_ns = future.result()
+                    elapsed_ns[kind] += duration_ns
+                    for filename, result in file_results.items():
+                        fresh_results[(filename, kind)] = result
+                        if kind == 'security':
+                            high_severity += _count_high_severity(result)
+                    if early_exit_at and high_severity >= early_exit_at:
+                        logger.info(
+                            "🛑 %d high-severity findings, skipping remaining analysis", high_severity)
+                        metrics['early_exit'] = True
+                        executor.shutdown(wait=False, cancel_futures=True)
+                        break
+        for kind, total_ns in elapsed_ns.items():
+            metrics[f'{kind}_ms'] = total_ns // 1_000_000
+        self._store_shared_results(eligible, fresh_results)
+        results.update(fresh_results)
+        # Analyzers that raised, or were cancelled by an early exit, left no result
+        expected_kinds = (['ai'] if ai_available else []) + kinds
+        metrics['missing_results'] = sum(1 for file in eligible for kind in expected_kinds
+                                         if (file['filename'], kind) not in results)
+        for filename, representative in duplicates:
+            for kind in ('ai', 'smart', 'security'):
+                result = results.get((representative, kind))
+                if result is not None:
+                    # Security findings name their file; the insights are
+                    # tagged with their filename when merged below
+                    results[(filename, kind)] = (
+                        [{**vuln, 'filename': filename} for vuln in result]
+                        if kind == 'security' else result)
+
+        # Merge results in file order so the comment is deterministic
+        vulns_by_severity = analysis['security_vulnerabilities_by_severity']
+        severity_counts = analysis['security_severity_counts']
+        inline_findings = analysis['inline_review_findings']
+        for file, language in eligible_files:
+            filename = file['filename']
+            additions = file['additions']
             analyzed_files += 1
             file_analysis = {
-                'filename': file.filename,
+                'filename': filename,
                 'language': language,
-                'additions': file.additions,
-                'deletions': file.deletions,
-                'insights': [],
-                'vulnerabilities': [],
+                'additions': additions,
+                'deletions': file['deletions'],
+                'insight_count': 0,
+                'vulnerability_count': 0,
                 'complexity': {},
-                'risk_score': 0
+                'risk_score': 0,
+                'truncated': file.get('truncated', False)
             }
 
             # AI Analysis (Primary - New!)
-            if self.ai_analyzer and self.ai_analyzer.is_ai_available():
-                try:
-                    print(f"🤖 AI analyzing {file.filename}...")
-                    ai_insights = self.ai_analyzer.analyze_code_intelligence(
-                        file.patch,
-                        file.filename
-                    )
-
-                    for insight in ai_insights:
-                        insight['filename'] = file.filename
-                        analysis['ai_insights'].append(insight)
-                        file_analysis['insights'].extend(ai_insights)
-                except Exception as e:
-                    print(f"⚠️ AI analysis failed for {file.filename}: {e}")
+            ai_insights = results.get((filename, 'ai'))
+            if ai_insights is not None:
+                self._record_insights(analysis, 'ai', ai_insights,
+                                      file_analysis, _ai_insight_category)
 
             # Smart Code Analysis (Secondary)
-            if self.code_analyzer:
-                try:
-                    print(f"🧮 Smart analyzing {file.filename}...")
-                    smart_insights = self.code_analyzer.analyze_code_quality(
-                        file.patch,
-                        file.filename
-                    )
-
-                    for insight in smart_insights:
-                        insight['filename'] = file.filename
-                        analysis['smart_insights'].append(insight)
-                        file_analysis['insights'].extend(smart_insights)
-
-                    # Complexity analysis
-                    complexity = self.code_analyzer.calculate_complexity_score(
-                        file.patch)
-                    analysis['complexity_analysis'][file.filename] = complexity
-                    file_analysis['complexity'] = complexity
-                    total_quality_score += (10 - complexity.get('score', 5))
-
-                except Exception as e:
-                    print(f"⚠️ Smart analysis failed for {file.filename}: {e}")
+            smart_result = results.get((filename, 'smart'))
+            if smart_result is not None:
+                smart_insights, complexity = smart_result
+                self._record_insights(analysis, 'smart', smart_insights,
+                                      file_analysis, _smart_insight_category)
+
+                # Complexity analysis
+                analysis['complexity_analysis'][filename] = complexity
+                file_analysis['complexity'] = complexity
+                total_quality_score += (10 - complexity.get('score', 5))
 
             # Security Analysis (Critical)
-            if self.security_scanner:
-                try:
-                    print(f"🔒 Security scanning {file.filename}...")
-                    vulnerabilities = self.security_scanner.scan_for_vulnerabilities(
-                        file.patch,
-                        file.filename
-                    )
-                    analysis['security_vulnerabilities'].extend(
-                        vulnerabilities)
-                    file_analysis['vulnerabilities'] = vulnerabilities
-
-                    # Count high severity issues for risk assessment
-                    high_severity_count = len(
-                        [v for v in vulnerabilities if v['severity'] == 'high'])
-                    if high_severity_count > 0:
-                        high_risk_files += 1
-                        file_analysis['risk_score'] = min(
-                            10, high_severity_count * 3)
-
-                except Exception as e:
-                    print(
-                        f"⚠️ Security analysis failed for {file.filename}: {e}")
+            vulnerabilities = results.get((filename, 'security'))
+            if vulnerabilities is not None:
+                analysis['security_vulnerability_count'] += len(vulnerabilities)
+                file_analysis['vulnerability_count'] = len(vulnerabilities)
+
+                # Count by severity for risk scoring; keep only what the comment
+                # and the inline review show
+                high_severity_count = 0
+                for vuln in vulnerabilities:
+                    severity = vuln.get('severity', 'low')
+                    severity_counts[severity] = severity_counts.get(severity, 0) + 1
+                    bucket = vulns_by_severity.get(severity)
+                    if bucket is not None:
+                        _retain(bucket, vuln)
+                    if severity == 'high':
+                        high_severity_count += 1
+                        # Line 1 is the hunk header, which has no diff position
+                        if vuln.get('line', 0) >= 2:
+                            _retain(inline_findings, vuln)
+
+                if high_severity_count > 0:
+                    high_risk_files += 1
+                    file_analysis['risk_score'] = min(
+                        10, high_severity_count * 3)
 
             # File-level suggestions
-            if file.additions > 100:
+            if additions > 100:
                 suggestion = {
                     'type': 'maintainability',
                     'severity': 'info',
-                    'message': f'Large change in {file.filename} ({file.additions} lines added). Consider breaking into smaller commits.',
-                    'filename': file.filename
+                    'message': f'Large change in {filename} ({additions} lines added). Consider breaking into smaller commits.',
+                    'filename': filename
                 }
-                analysis['suggestions'].append(suggestion)
+                _retain(analysis['suggestions'], suggestion)
 
             # Store file analysis
-            analysis['file_analysis'][file.filename] = file_analysis
+            analysis['file_analysis'][filename] = file_analysis
 
         # Calculate overall metrics
         if analyzed_files > 0:
@@ -295,8 +927,7 @@ I encountered an issue while analyzing this PR. The development team has been no
                 total_quality_score / analyzed_files, 1)
 
         # Calculate overall risk score
-        security_risk = len(
-            [v for v in analysis['security_vulnerabilities'] if v['severity'] == 'high']) * 3
+        security_risk = severity_counts['high'] * 3
         complexity_risk = len([c for c in analysis['complexity_analysis'].values()
                               if c.get('score', 0) > 7]) * 2
         size_risk = 1 if analysis['total_additions'] > 500 else 0
@@ -304,166 +935,243 @@ I encountered an issue while analyzing this PR. The development team has been no
         analysis['overall_risk_score'] = min(
             10, security_risk + complexity_risk + size_risk)
 
-        print(f"✅ Comprehensive analysis complete:")
-        print(f"   🤖 {len(analysis['ai_insights'])} AI insights")
-        print(f"   🧠 {len(analysis['smart_insights'])} smart insights")
-        print(
-            f"   🔒 {len(analysis['security_vulnerabilities'])} security issues")
-        print(f"   📊 Quality score: {analysis['code_quality_score']}/10")
-        print(f"   ⚠️ Risk score: {analysis['overall_risk_score']}/10")
+        logger.info("✅ Comprehensive analysis complete: 🤖 %d AI insights, 🧠 %d smart insights, "
+                    "🔒 %d security issues, 📊 quality %s/10, ⚠️ risk %s/10",
+                    analysis['ai_insight_count'], analysis['smart_insight_count'],
+                    analysis['security_vulnerability_count'],
+                    analysis['code_quality_score'], analysis['overall_risk_score'])
 
         return analysis
 
-    def _detect_language(self, filename: str, file_ext: str) -> str:
-        """Detect programming language from filename"""
-        language_map = {
-            'py': 'Python', 'js': 'JavaScript', 'jsx': 'JavaScript',
-            'ts': 'TypeScript', 'tsx': 'TypeScript', 'java': 'Java',
-            'cpp': 'C++', 'c': 'C', 'h': 'C/C++', 'cs': 'C#',
-            'php': 'PHP', 'rb': 'Ruby', 'go': 'Go', 'rs': 'Rust',
-            'kt': 'Kotlin', 'swift': 'Swift', 'sql': 'SQL'
-        }
-        return language_map.get(file_ext, 'Unknown')
+    def _record_insights(self, analysis: Dict[str, Any], kind: str, insights: List[Dict],
+                         file_analysis: Dict[str, Any], categorize) -> None:
+        """Merge one analyzer's insights for a file into the PR and file analysis"""
+        filename = file_analysis['filename']
+        # Copy rather than tag in place; results may be shared cache entries
+        tagged = [{**insight, 'filename': filename}
+                  for insight in insights if isinstance(insight, dict)]
+        analysis[f'{kind}_insight_count'] += len(tagged)
+        buckets = analysis[f'{kind}_insights']
+        for insight in tagged:
+            bucket = buckets.get(categorize(insight['type']))
+            if bucket is not None:
+                _retain(bucket, insight)
+        file_analysis['insight_count'] += len(tagged)
+
+    def _load_shared_results(self, files: List[Dict[str, Any]], kinds: List[str]) -> Dict[Tuple[str, str], Any]:
+        """Fetch cached (filename, kind) results for these files in one round trip"""
+        if self._result_cache is None or not files or not kinds:
+            return {}
+        lookups = [(file['filename'], kind, result_key(file['filename'], file['patch'], kind))
+                   for file in files for kind in kinds]
+        values = self._result_cache.get_many([key for _, _, key in lookups])
+        return {(filename, kind): value
+                for (filename, kind, _), value in zip(lookups, values)
+                if value is not None}
+
+    def _store_shared_results(self, files: List[Dict[str, Any]], results: Dict[Tuple[str, str], Any]):
+        """Publish freshly computed results for other workers to reuse"""
+        if self._result_cache is None or not results:
+            return
+        patches = {file['filename']: file['patch'] for file in files}
+        self._result_cache.set_many({
+            result_key(filename, patches[filename], kind): result
+            for (filename, kind), result in results.items()
+        })
+
+    def _run_analyzer(self, kind: str, file: Dict[str, Any]) -> Tuple[str, Dict[str, Any], int]:
+        """Run the smart or security analyzer over one file; called from worker threads"""
+        filename = file['filename']
+        patch = file['patch']
+        timed = settings.detailed_timing
+        start = time.perf_counter_ns() if timed else 0
+        results = {}
+        try:
+            if kind == 'smart':
+                logger.debug("🧮 Smart analyzing %s...", filename)
+                smart_insights = self.code_analyzer.analyze_code_quality(
+                    patch,
+                    filename
+                )
+                complexity = self.code_analyzer.calculate_complexity_score(
+                    patch)
+                results[filename] = (smart_insights, complexity)
+            else:
+                logger.debug("🔒 Security scanning %s...", filename)
+                results[filename] = self.security_scanner.scan_for_vulnerabilities(
+                    patch,
+                    filename
+                )
+        except Exception as e:
+            logger.warning("⚠️ %s analysis failed for %s: %s",
+                           _ANALYZER_LABELS[kind], filename, e)
 
-    def _is_binary_file(self, filename: str) -> bool:
-        """Check if file is likely binary"""
-        binary_extensions = {
-            'jpg', 'jpeg', 'png', 'gif', 'pdf', 'zip', 'mp3', 'mp4', 'exe'
-        }
-        file_ext = filename.split('.')[-1].lower() if '.' in filename else ''
-        return file_ext in binary_extensions
+        return kind, results, time.perf_counter_ns() - start if timed else 0
+
+    def _run_ai_batch(self, files: List[Dict[str, Any]]) -> Tuple[str, Dict[str, Any], int]:
+        """Run the AI analyzer over a batch of files; called from worker threads"""
+        filenames = [file['filename'] for file in files]
+        timed = settings.detailed_timing
+        start = time.perf_counter_ns() if timed else 0
+        results = {}
+        try:
+            logger.debug("🤖 AI analyzing %d files...", len(filenames))
+            batch = self.ai_analyzer.analyze_code_intelligence_batch(
+                [(file['patch'], file['filename']) for file in files])
+            results = dict(zip(filenames, batch))
+        except Exception as e:
+            logger.warning("⚠️ AI analysis failed for %s: %s", ', '.join(filenames), e)
+
+        return 'ai', results, time.perf_counter_ns() - start if timed else 0
+
+    def _is_analyzable(self, file: Dict[str, Any]) -> bool:
+        """Whether a file would reach the analyzers at all"""
+        _, is_binary = self._classify_file(file['filename'])
+        return (not is_binary and file['additions'] <= _MAX_ANALYZED_ADDITIONS and bool(file['patch'])
+                and not _is_trivial_patch(file['filename'], file['patch']))
+
+    def _classify_file(self, filename: str) -> Tuple[str, bool]:
+        """Detect the language and whether the file is likely binary from one extension lookup"""
+        file_ext = _file_extension(filename)
+        return _LANGUAGE_BY_EXT.get(file_ext, 'Unknown'), file_ext in _BINARY_EXTS
+
+    def _build_review_comments(self, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Inline review comments for the first few high-severity findings"""
+        comments = []
+        # Scanner lines count from the patch's first hunk header, which is
+        # exactly one more than GitHub's diff position
+        return [{
+            'path': vuln['filename'],
+            'position': vuln['line'] - 1,
+            'body': f"🔴 **{vuln['description']}**\n\n💡 {vuln['recommendation']}"
+        } for vuln in analysis['inline_review_findings']]
 
     def _generate_comprehensive_comment(self, analysis: Dict[str, Any]) -> str:
         """Generate comprehensive AI-powered PR comment"""
-        comment = "## 🤖 AI Code Review Assistant\n\n"
+        parts = [_COMMENT_HEADER]
+        append = parts.append
 
         # Analysis mode indicator
-        modes = analysis.get('analysis_modes', [])
-        mode_emojis = {
-            'lightweight_transformers': '🧠',
-            'tfidf_analysis': '📊',
-            'smart_heuristics': '⚡',
-            'security_scanning': '🔒'
-        }
-        mode_display = ' + '.join([f"{mode_emojis.get(mode, '🔍')} {mode.replace('_', ' ').title()}"
-                                  for mode in modes])
-        comment += f"*Analysis powered by: {mode_display}*\n\n"
+        mode_display = _render_mode_display(
+            tuple(analysis.get('analysis_modes', [])))
+        append(f"*Analysis powered by: {mode_display}*\n\n")
 
         # Executive Summary
         risk_score = analysis.get('overall_risk_score', 0)
-        if risk_score >= 7:
-            risk_emoji, risk_level = "🔴", "High Risk"
-        elif risk_score >= 4:
-            risk_emoji, risk_level = "🟡", "Medium Risk"
-        else:
-            risk_emoji, risk_level = "🟢", "Low Risk"
+        risk_emoji, risk_level = next(
+            ((emoji, level) for threshold, emoji, level in _RISK_TIERS
+             if risk_score >= threshold), _RISK_TIERS[-1][1:])
 
-        comment += f"## 📊 Executive Summary\n\n"
-        comment += f"**{risk_emoji} Overall Risk: {risk_level} ({risk_score}/10)**\n\n"
+        append("## 📊 Executive Summary\n\n")
+        append(f"**{risk_emoji} Overall Risk: {risk_level} ({risk_score}/10)**\n\n")
 
         # Key metrics
-        comment += f"**📈 Key Metrics:**\n"
-        comment += f"- Files analyzed: {analysis['files_changed']}\n"
-        comment += f"- Languages: {', '.join(sorted(analysis['languages'])) if analysis['languages'] else 'Mixed'}\n"
-        comment += f"- Changes: +{analysis['total_additions']} / -{analysis['total_deletions']} lines\n"
+        append("**📈 Key Metrics:**\n")
+        append(f"- Files analyzed: {analysis['files_changed']}\n")
+        append(f"- Languages: {', '.join(sorted(analysis['languages'])) if analysis['languages'] else 'Mixed'}\n")
+        append(f"- Changes: +{analysis['total_additions']} / -{analysis['total_deletions']} lines\n")
 
-        if analysis['code_quality_score'] > 0:
-            quality_emoji = "🟢" if analysis['code_quality_score'] >= 7 else "🟡" if analysis['code_quality_score'] >= 4 else "🔴"
-            comment += f"- Code quality: {quality_emoji} {analysis['code_quality_score']}/10\n"
+        quality_score = analysis['code_quality_score']
+        if quality_score > 0:
+            quality_emoji = next(emoji for threshold, emoji in _QUALITY_TIERS
+                                 if quality_score >= threshold)
+            append(f"- Code quality: {quality_emoji} {quality_score}/10\n")
 
-        comment += "\n"
+        append("\n")
 
         # Security Issues (Highest Priority)
-        security_vulns = analysis.get('security_vulnerabilities', [])
-        if security_vulns:
-            comment += "## 🚨 Security Analysis\n\n"
+        security_vuln_count = analysis['security_vulnerability_count']
+        if security_vuln_count:
+            append("## 🚨 Security Analysis\n\n")
 
-            high_vulns = [v for v in security_vulns if v['severity'] == 'high']
-            medium_vulns = [
-                v for v in security_vulns if v['severity'] == 'medium']
+            vulns_by_severity = analysis['security_vulnerabilities_by_severity']
+            high_vulns = vulns_by_severity['high']
+            medium_vulns = vulns_by_severity['medium']
 
             if high_vulns:
-                comment += "### 🔴 Critical Issues (Immediate Action Required)\n"
-                for vuln in high_vulns[:3]:
-                    comment += f"- **{vuln['description']}** in `{vuln['filename']}`"
-                    if 'line' in vuln:
-                        comment += f" (line {vuln['line']})"
-                    comment += f"\n  💡 *{vuln['recommendation']}*\n"
-                comment += "\n"
+                append("### 🔴 Critical Issues (Immediate Action Required)\n")
+                for vuln in high_vulns:
+                    line = f" (line {vuln['line']})" if 'line' in vuln else ""
+                    append(f"- **{vuln['description']}** in `{vuln['filename']}`{line}"
+                           f"\n  💡 *{vuln['recommendation']}*\n")
+                append("\n")
 
             if medium_vulns:
-                comment += "### 🟡 Medium Priority Issues\n"
-                for vuln in medium_vulns[:2]:
-                    comment += f"- {vuln['description']} in `{vuln['filename']}`\n"
-                comment += "\n"
+                append("### 🟡 Medium Priority Issues\n")
+                parts.extend(f"- {vuln['description']} in `{vuln['filename']}`\n"
+                             for vuln in medium_vulns)
+                append("\n")
+
+            if analysis['performance_metrics'].get('early_exit'):
+                append("*Analysis stopped early because of the number of critical issues; "
+                       "some files were not reviewed.*\n\n")
 
         # AI Insights (New!)
-        ai_insights = analysis.get('ai_insights', [])
-        smart_insights = analysis.get('smart_insights', [])
-
-        if ai_insights:
-            comment += "## 🧠 AI Intelligence Analysis\n\n"
-
-            # Group AI insights by type
-            ai_complexity = [
-                i for i in ai_insights if 'complexity' in i['type']]
-            ai_patterns = [i for i in ai_insights if 'pattern' in i['type']]
-            ai_semantic = [i for i in ai_insights if 'semantic' in i['type']]
-
-            if ai_complexity:
-                comment += "### ⚡ AI Complexity Analysis\n"
-                for insight in ai_complexity[:2]:
-                    comment += f"- {insight['message']}\n"
-                comment += "\n"
-
-            if ai_patterns:
-                comment += "### 🔍 AI Pattern Recognition\n"
-                for insight in ai_patterns[:2]:
-                    comment += f"- {insight['message']}\n"
-                comment += "\n"
+        ai_insights = analysis['ai_insights']
+        smart_insights = analysis['smart_insights']
+
+        if analysis['ai_insight_count']:
+            append("## 🧠 AI Intelligence Analysis\n\n")
+
+            if ai_insights['complexity']:
+                append("### ⚡ AI Complexity Analysis\n")
+                parts.extend(f"- {insight['message']}\n"
+                             for insight in ai_insights['complexity'])
+                append("\n")
+
+            if ai_insights['pattern']:
+                append("### 🔍 AI Pattern Recognition\n")
+                parts.extend(f"- {insight['message']}\n"
+                             for insight in ai_insights['pattern'])
+                append("\n")
 
         # Smart Insights
-        if smart_insights:
-            comment += "## ⚡ Smart Analysis\n\n"
-
-            complexity_insights = [
-                i for i in smart_insights if i['type'] == 'complexity']
-            pattern_insights = [
-                i for i in smart_insights if i['type'] == 'pattern']
-
-            if complexity_insights:
-                comment += "### 🧮 Complexity & Performance\n"
-                for insight in complexity_insights[:2]:
-                    comment += f"- {insight['message']}\n"
-                comment += "\n"
-
-            if pattern_insights:
-                comment += "### 🔍 Code Patterns\n"
-                for insight in pattern_insights[:3]:
-                    comment += f"- {insight['message']}\n"
-                comment += "\n"
+        if analysis['smart_insight_count']:
+            append("## ⚡ Smart Analysis\n\n")
+
+            if smart_insights['complexity']:
+                append("### 🧮 Complexity & Performance\n")
+                parts.extend(f"- {insight['message']}\n"
+                             for insight in smart_insights['complexity'])
+                append("\n")
+
+            if smart_insights['pattern']:
+                append("### 🔍 Code Patterns\n")
+                parts.extend(f"- {insight['message']}\n"
+                             for insight in smart_insights['pattern'])
+                append("\n")
 
         # Suggestions
-        suggestions = analysis.get('suggestions', [])
+        suggestions = analysis['suggestions']
         if suggestions:
-            comment += "## 💡 Recommendations\n\n"
-            for suggestion in suggestions[:3]:
-                comment += f"- 💡 {suggestion['message']}\n"
-            comment += "\n"
+            append("## 💡 Recommendations\n\n")
+            parts.extend(f"- 💡 {suggestion['message']}\n"
+                         for suggestion in suggestions)
+            append("\n")
 
         # Positive feedback for good code
-        if (risk_score <= 3 and len(security_vulns) == 0 and analysis.get('code_quality_score', 0) >= 7):
-            comment += "## ✨ Excellent Work!\n\n"
-            comment += "This PR demonstrates high-quality code with excellent patterns and no security concerns. Keep up the outstanding work! 🎉\n\n"
+        if (risk_score <= 3 and security_vuln_count == 0 and analysis.get('code_quality_score', 0) >= 7):
+            append(_EXCELLENT_WORK_SECTION)
 
         # Footer
-        comment += "---\n"
-        total_insights = len(ai_insights) + len(smart_insights)
-        comment += f"*🤖 Analysis complete: {total_insights} insights, {len(security_vulns)} security checks*\n"
-        comment += f"*⚡ Powered by Neural Code Review Assistant*"
+        total_insights = analysis['ai_insight_count'] + \
+            analysis['smart_insight_count']
+        append(_COMMENT_FOOTER.format(insights=total_insights,
+                                      security_checks=security_vuln_count))
+
+        return "".join(parts)
+
 
-        return comment
+# Global service instance, built on first use so importing the app stays cheap
+_service: Optional[GitHubService] = None
+_service_lock = threading.Lock()
 
 
-# Global service instance
-github_service = GitHubService()
+def get_github_service() -> GitHubService:
+    """Return the shared GitHubService, creating it on the first call"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = GitHubService()
+    return _service
@@ -0,0 +1,77 @@
+import gzip
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Shared analyzer results expire after an hour
+_RESULT_TTL_SECONDS = 3600
+
+# The cache is an optimization, so a slow or unreachable Redis must fail fast
+# rather than stall analyses
+_REDIS_TIMEOUT_SECONDS = 1
+
+
+def result_key(filename: str, patch: str, kind: str) -> str:
+    """Cache key for one analyzer's result on one file's patch"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(filename.encode('utf-8', 'replace'))
+    digest.update(b"\0")
+    digest.update(patch.encode('utf-8', 'replace'))
+    return f"analysis:{digest.hexdigest()}/{kind}"
+
+
+class RedisCacheBackend:
+    """Analyzer results shared by every worker and instance through Redis"""
+
+    def __init__(self, url: str, ttl_seconds: int = _RESULT_TTL_SECONDS):
+        # Import here so redis is only required when a URL is configured
+        import redis
+
+        self._client = redis.Redis.from_url(
+            url, socket_connect_timeout=_REDIS_TIMEOUT_SECONDS,
+            socket_timeout=_REDIS_TIMEOUT_SECONDS)
+        self._ttl_seconds = ttl_seconds
+
+    def ping(self) -> None:
+        """Round trip to Redis; raises if it cannot be reached"""
+        self._client.ping()
+
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Fetch several results in one round trip; misses come back as None"""
+        if not keys:
+            return []
+
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key in keys:
+                pipe.get(key)
+            raw_values = pipe.execute()
+        except Exception as e:
+            logger.warning("⚠️ Redis cache read failed: %s", e)
+            return [None] * len(keys)
+
+        values = []
+        for raw in raw_values:
+            try:
+                values.append(json.loads(gzip.decompress(raw))
+                              if raw is not None else None)
+            except (OSError, ValueError):
+                values.append(None)
+        return values
+
+    def set_many(self, items: Dict[str, Any]) -> None:
+        """Store several results in one round trip"""
+        if not items:
+            return
+
+        try:
+            pipe = self._client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(key, gzip.compress(json.dumps(value).encode()),
+                         ex=self._ttl_seconds)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("⚠️ Redis cache write failed: %s", e)
@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""Test PR analysis and comment rendering without GitHub"""
+
+import threading
+import time
+from unittest import mock
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.core.config import settings
+from app.models.code_analyzer import SmartCodeAnalyzer
+from app.security.vulnerability_scanner import AdvancedSecurityScanner
+from github import GithubException
+
+from app.services.github_service import GitHubService, _file_extension, _is_trivial_patch
+
+
+def make_service(private_key='', result_cache=None, **analyzers):
+    """Build a GitHubService without touching GitHub or loading AI models"""
+    return GitHubService(app_id=1, private_key=private_key, analyzers=analyzers,
+                         result_cache=result_cache, http=mock.Mock())
+
+
+def make_file(filename, patch, additions=10, deletions=0):
+    return {'filename': filename, 'patch': patch or '', 'additions': additions,
+            'deletions': deletions, 'sha': '0' * 40}
+
+
+def test_comment_renders_for_empty_pr():
+    service = make_service()
+
+    analysis = service._analyze_pr_changes_comprehensive([])
+    comment = service._generate_comprehensive_comment(analysis)
+
+    assert "Files analyzed: 0" in comment
+    assert "0 insights, 0 security checks" in comment
+
+
+def test_comment_renders_synthetic_analysis():
+    service = make_service(code_analyzer=SmartCodeAnalyzer(),
+                           security_scanner=AdvancedSecurityScanner())
+    patch = '''@@ -0,0 +1,4 @@
++password = "hardcoded_secret_123"
++def handler(user_input):
++    # TODO: validate input
++    print(user_input)
+'''
+    files = [make_file("app/handler.py", patch, additions=150),
+             make_file("logo.png", None)]
+
+    analysis = service._analyze_pr_changes_comprehensive(files)
+    comment = service._generate_comprehensive_comment(analysis)
+
+    assert analysis['files_changed'] == 2
+    assert "Files analyzed: 2" in comment
+    assert "Hardcoded credentials detected" in comment
+    assert "Large change in app/handler.py" in comment
+    assert comment.endswith("*⚡ Powered by Neural Code Review Assistant*")
+
+
+def test_identical_patches_reuse_cached_analysis():
+    service = make_service(code_analyzer=SmartCodeAnalyzer())
+    patch = "@@ -0,0 +1 @@\n+print('hello')\n"
+
+    first = service._analyze_pr_changes_memoized([make_file("a.py", patch)])
+    second = service._analyze_pr_changes_memoized([make_file("a.py", patch)])
+    changed = service._analyze_pr_changes_memoized(
+        [make_file("a.py", patch + "+print('again')\n")])
+
+    assert second is first
+    assert changed is not first
+    assert service._analysis_cache_hits == 1
+
+
+def test_failed_analyses_are_not_memoized():
+    analyzer = mock.Mock()
+    analyzer.analyze_code_quality.side_effect = [RuntimeError("model unavailable"), [], []]
+    analyzer.calculate_complexity_score.return_value = {'score': 1}
+    service = make_service(code_analyzer=analyzer)
+    files = [make_file("a.py", "@@ -0,0 +1 @@\n+print('hello')\n")]
+
+    failed = service._analyze_pr_changes_memoized(files)
+    retried = service._analyze_pr_changes_memoized(files)
+    reused = service._analyze_pr_changes_memoized(files)
+
+    assert failed['performance_metrics']['missing_results'] == 1
+    assert retried is not failed
+    assert retried['performance_metrics']['missing_results'] == 0
+    assert reused is retried
+
+
+def test_blank_line_and_docs_changes_skip_analyzers():
+    service = make_service(security_scanner=AdvancedSecurityScanner())
+    blank_lines = "@@ -1,2 +1,3 @@\n def f():\n+\n-  \n+\t\n     return 1\n"
+    files = [make_file("app/util.py", blank_lines),
+             make_file("README.md", '@@ -1 +1 @@\n+password = "hunter2hunter2"\n')]
+
+    analysis = service._analyze_pr_changes_comprehensive(files)
+
+    assert analysis['security_vulnerability_count'] == 0
+    assert analysis['performance_metrics']['trivial_files_skipped'] == 2
+    assert analysis['file_analysis']['README.md']['trivial']
+
+
+def test_reindented_reordered_or_respaced_lines_are_analyzed():
+    reindent = "@@ -1,2 +1,2 @@\n if admin:\n-    delete_all()\n+delete_all()\n"
+    reorder = "@@ -1,2 +1,2 @@\n-check_auth()\n-delete_all()\n+delete_all()\n+check_auth()\n"
+    respace = '@@ -1 +1 @@\n-run("rm -rf /tmp/build")\n+run("rm -rf / tmp/build")\n'
+    increment = "@@ -1 +1,2 @@\n int i = 0;\n+++i;\n"
+    decrement = "@@ -1,2 +1 @@\n x = 1\n--- x\n"
+
+    for patch in (reindent, reorder, respace, increment, decrement):
+        assert not _is_trivial_patch("app/jobs.py", patch)
+
+
+def test_identical_patches_are_analyzed_once_per_pr():
+    scanner = AdvancedSecurityScanner()
+    service = make_service(security_scanner=scanner)
+    patch = '@@ -0,0 +1 @@\n+password = "hardcoded_secret_123"\n'
+
+    with mock.patch.object(scanner, 'scan_for_vulnerabilities',
+                           wraps=scanner.scan_for_vulnerabilities) as scan:
+        analysis = service._analyze_pr_changes_comprehensive(
+            [make_file("old/config.py", patch), make_file("new/config.py", patch)])
+
+    assert scan.call_count == 1
+    assert analysis['performance_metrics']['duplicate_patches'] == 1
+    assert [v['filename'] for v in analysis['security_vulnerabilities_by_severity']['high']] == \
+        ["old/config.py", "new/config.py"]
+
+
+def test_high_severity_findings_become_inline_review_comments():
+    service = make_service(security_scanner=AdvancedSecurityScanner())
+    patch = '@@ -0,0 +1,2 @@\n+import os\n+password = "hardcoded_secret_123"\n'
+
+    analysis = service._analyze_pr_changes_comprehensive(
+        [make_file("app/settings.py", patch)])
+    comments = service._build_review_comments(analysis)
+
+    assert comments == [{
+        'path': "app/settings.py",
+        'position': 2,
+        'body': "🔴 **Hardcoded credentials detected**\n\n"
+                "💡 Store secrets in environment variables or secure vaults"
+    }]
+
+
+def test_large_prs_retain_only_the_findings_the_comment_shows():
+    service = make_service(security_scanner=AdvancedSecurityScanner())
+    patch = '@@ -0,0 +1,2 @@\n+import os\n+password = "hardcoded_secret_123"\n'
+    files = [make_file(f"app/settings{n}.py", patch + f"+# {n}\n") for n in range(10)]
+
+    analysis = service._analyze_pr_changes_comprehensive(files)
+
+    assert analysis['security_vulnerability_count'] == 10
+    assert analysis['security_severity_counts']['high'] == 10
+    assert len(analysis['security_vulnerabilities_by_severity']['high']) == 3
+    assert len(service._build_review_comments(analysis)) == 3
+    assert analysis['file_analysis']['app/settings0.py']['vulnerability_count'] == 1
+
+
+def test_models_load_on_the_pool_without_blocking_construction():
+    loading = threading.Event()
+    release = threading.Event()
+
+    def load_analyzers(self):
+        loading.set()
+        release.wait()
+        self._set_analyzers({'code_analyzer': SmartCodeAnalyzer()})
+
+    with mock.patch.object(GitHubService, '_load_analyzers', load_analyzers):
+        service = GitHubService(app_id=1, private_key='', result_cache=None, http=mock.Mock())
+
+    assert loading.wait(timeout=5)
+    assert service.code_analyzer is None
+    release.set()
+    service._analyzers_loaded.result(timeout=5)
+    assert service.code_analyzer is not None
+
+
+def test_installation_tokens_are_reused_until_near_expiry():
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    service = make_service(private_key=key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption()).decode())
+    service._http.post.return_value.json.return_value = {
+        'token': 'ghs_test', 'expires_at': '2999-01-01T00:00:00Z'}
+
+    first = service.get_installation_access_token(42)
+    second = service.get_installation_access_token(42)
+    service._token_cache[42] = ('ghs_stale', 0)
+    refreshed = service.get_installation_access_token(42)
+
+    assert first == second == refreshed == 'ghs_test'
+    assert service._http.post.call_count == 2
+    assert service._http.post.call_args.kwargs['timeout'] == 10
+
+
+def test_file_pages_are_fetched_together_in_order():
+    def github_file(n):
+        return {'filename': f"f{n}.py", 'patch': "+x", 'additions': 1,
+                'deletions': 0, 'sha': str(n)}
+
+    pages = {1: [github_file(n) for n in range(100)],
+             2: [github_file(n) for n in range(100, 200)],
+             3: [github_file(n) for n in range(200, 250)]}
+    requested = []
+
+    def get(url, headers, params, timeout):
+        # Later pages answer first, so any mix-up between threads shows up
+        time.sleep(0.01 * (4 - params['page']))
+        requested.append(params['page'])
+        assert url.endswith("/repos/o/r/pulls/7/files")
+        assert headers['Authorization'] == "token ghs_test"
+        assert params['per_page'] == 100
+        response = mock.Mock()
+        response.json.return_value = pages[params['page']]
+        return response
+
+    service = make_service()
+    service._http.get.side_effect = get
+
+    files = service._preload_files("ghs_test", "o/r", 7, 250)
+
+    assert [f['filename'] for f in files] == [f"f{n}.py" for n in range(250)]
+    assert sorted(requested) == [1, 2, 3]
+
+
+def test_file_pages_stop_at_githubs_3000_file_limit():
+    service = make_service()
+    service._http.get.return_value.json.return_value = []
+
+    service._preload_files("ghs_test", "o/r", 7, 5000)
+
+    assert service._http.get.call_count == 30
+
+
+def fake_github_api(changed_files, pr_etag='"v1"'):
+    """requests.Session.get stand-in serving one PR and its files"""
+    calls = []
+
+    def get(url, headers, timeout, params=None):
+        calls.append((url, dict(headers)))
+        response = mock.Mock(headers={'ETag': pr_etag})
+        if url.endswith("/files"):
+            response.status_code = 200
+            response.json.return_value = changed_files
+        elif headers.get('If-None-Match') == pr_etag:
+            response.status_code = 304
+        else:
+            response.status_code = 200
+            response.json.return_value = {'changed_files': len(changed_files)}
+        return response
+
+    return get, calls
+
+
+def test_comments_are_posted_from_the_comment_workers_own_client():
+    service = make_service(private_key='unused', security_scanner=AdvancedSecurityScanner())
+    service._token_cache[1] = ('ghs_test', time.time() + 3600)
+    service._http.get.side_effect, _ = fake_github_api([{
+        'filename': "app/config.py", 'additions': 1, 'deletions': 0, 'sha': "0" * 40,
+        'patch': '@@ -0,0 +1 @@\n+password = "hardcoded_secret_123"\n'}])
+    client = mock.Mock()
+
+    with mock.patch.object(service, 'get_github_client', return_value=client) as get_client:
+        service.analyze_and_comment_on_pr(1, "o/r", 7)
+        service._comment_queue.join()
+
+    # Only the comment worker built a PyGithub client; the analysis used the session
+    get_client.assert_called_once_with(1)
+    client.get_repo.assert_called_once_with("o/r", lazy=True)
+    pr = client.get_repo.return_value.get_pull.return_value
+    body = pr.create_issue_comment.call_args.args[0]
+    assert "Hardcoded credentials detected" in body
+
+
+def test_unchanged_prs_reuse_cached_files_and_expired_entries_are_dropped():
+    service = make_service(private_key='unused')
+    service._token_cache[1] = ('ghs_test', time.time() + 3600)
+    service._http.get.side_effect, calls = fake_github_api([{
+        'filename': "a.py", 'patch': "+x", 'additions': 1, 'deletions': 0, 'sha': "0" * 40}])
+    service._pr_cache[("o/r", 1)] = ('"old"', [], time.monotonic() - 3600)
+
+    first = service._get_pr_files(1, "o/r", 7)
+    second = service._get_pr_files(1, "o/r", 7)
+
+    assert second is first
+    # PR, files, then a conditional PR request answered with 304
+    assert [url.rsplit("/", 1)[1] for url, _ in calls] == ["7", "files", "7"]
+    assert calls[2][1]['If-None-Match'] == '"v1"'
+    assert list(service._pr_cache) == [("o/r", 7)]
+
+
+class DictCacheBackend:
+    """In-memory stand-in for RedisCacheBackend"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get_many(self, keys):
+        return [self.store.get(key) for key in keys]
+
+    def set_many(self, items):
+        self.store.update(items)
+
+
+def test_shared_results_are_reused_across_services():
+    backend = DictCacheBackend()
+    patch = '@@ -0,0 +1 @@\n+password = "hardcoded_secret_123"\n'
+    first = make_service(result_cache=backend, security_scanner=AdvancedSecurityScanner())
+    second = make_service(result_cache=backend, security_scanner=AdvancedSecurityScanner())
+
+    first._analyze_pr_changes_comprehensive([make_file("a.py", patch)])
+    analysis = second._analyze_pr_changes_comprehensive(
+        [make_file("a.py", patch)])
+
+    assert len(backend.store) == 1
+    assert analysis['performance_metrics']['cache_hits'] == 1
+    assert analysis['security_vulnerabilities_by_severity']['high'][0]['type'] == 'hardcoded_secrets'
+
+
+def test_file_extension_matches_splitext():
+    assert _file_extension("app/Main.PY") == ".py"
+    assert _file_extension("docs.v2/Makefile") == ""
+    assert _file_extension("config/.gitignore") == ""
+    assert _file_extension("archive.tar.gz") == ".gz"
+
+
+def test_full_backlog_rejects_new_analyses():
+    release = threading.Event()
+    service = make_service()
+    service.analyze_and_comment_on_pr = lambda *args: release.wait()
+
+    with mock.patch.object(settings, 'max_queued_analyses', 2):
+        first = service.submit_pr_analysis(1, "o/r", 1, "a" * 40)
+        second = service.submit_pr_analysis(1, "o/r", 2, "b" * 40)
+        assert service.submit_pr_analysis(1, "o/r", 1, "a" * 40) is first
+        assert service.submit_pr_analysis(1, "o/r", 3, "c" * 40) is None
+
+        release.set()
+        first.result(timeout=5)
+        second.result(timeout=5)
+        service._pool.shutdown(wait=True)
+        assert service._pending_analyses == 0
+
+
+def test_new_pushes_are_not_deduplicated_with_the_previous_head():
+    release = threading.Event()
+    service = make_service()
+    service.analyze_and_comment_on_pr = mock.Mock(side_effect=lambda *args: release.wait())
+
+    first = service.submit_pr_analysis(1, "o/r", 7, "a" * 40)
+    redelivery = service.submit_pr_analysis(1, "o/r", 7, "a" * 40)
+    new_push = service.submit_pr_analysis(1, "o/r", 7, "b" * 40)
+    release.set()
+    service._pool.shutdown(wait=True)
+
+    assert redelivery is first
+    assert new_push is not first
+    assert service.analyze_and_comment_on_pr.call_count == 2
+
+
+def test_early_exit_cancels_remaining_analysis():
+    scanner = mock.Mock()
+    scanner.scan_for_vulnerabilities.return_value = [
+        {'type': 'hardcoded_secrets', 'severity': 'high', 'line': 2,
+         'description': 'Hardcoded credentials detected', 'recommendation': 'Use a vault'}]
+    service = make_service(security_scanner=scanner)
+    files = [make_file(f"app/f{n}.py", f"@@ -0,0 +1 @@\n+token = {n}\n") for n in range(5)]
+
+    # One analyzer thread, so the remaining files are still queued when the
+    # first finding arrives
+    with mock.patch.object(settings, 'early_exit_high_severity_count', 1), \
+            mock.patch('app.services.github_service._MAX_ANALYZER_WORKERS', 1):
+        analysis = service._analyze_pr_changes_memoized(files)
+
+    assert analysis['performance_metrics']['early_exit']
+    assert scanner.scan_for_vulnerabilities.call_count == 1
+    assert analysis['security_vulnerability_count'] == 1
+    # A partial analysis is never served from the memo
+    assert not service._analysis_cache
+
+
+def test_comment_posting_backs_off_on_transient_errors():
+    service = make_service()
+    pr = mock.Mock(number=7)
+    post = mock.Mock(side_effect=[GithubException(502, None, None),
+                                  GithubException(503, None, None), "posted"])
+
+    with mock.patch('app.services.github_service.time.sleep') as sleep:
+        assert service._call_with_retry(pr, post, "body") == "posted"
+        assert [c.args[0] for c in sleep.call_args_list] == [1.0, 2.0]
+
+        # Client errors are not retried
+        post = mock.Mock(side_effect=GithubException(422, None, None))
+        try:
+            service._call_with_retry(pr, post, "body")
+        except GithubException as e:
+            assert e.status == 422
+        else:
+            raise AssertionError("expected GithubException")
+        assert post.call_count == 1
+
+        # Still failing after the last attempt: the error surfaces
+        post = mock.Mock(side_effect=GithubException(502, None, None))
+        try:
+            service._call_with_retry(pr, post, "body")
+        except GithubException:
+            pass
+        else:
+            raise AssertionError("expected GithubException")
+        assert post.call_count == 4
+
+
+if __name__ == "__main__":
+    test_comment_renders_for_empty_pr()
+    test_comment_renders_synthetic_analysis()
+    test_identical_patches_reuse_cached_analysis()
+    test_failed_analyses_are_not_memoized()
+    test_blank_line_and_docs_changes_skip_analyzers()
+    test_reindented_reordered_or_respaced_lines_are_analyzed()
+    test_identical_patches_are_analyzed_once_per_pr()
+    test_high_severity_findings_become_inline_review_comments()
+    test_large_prs_retain_only_the_findings_the_comment_shows()
+    test_models_load_on_the_pool_without_blocking_construction()
+    test_installation_tokens_are_reused_until_near_expiry()
+    test_file_pages_are_fetched_together_in_order()
+    test_file_pages_stop_at_githubs_3000_file_limit()
+    test_comments_are_posted_from_the_comment_workers_own_client()
+    test_unchanged_prs_reuse_cached_files_and_expired_entries_are_dropped()
+    test_shared_results_are_reused_across_services()
+    test_file_extension_matches_splitext()
+    test_full_backlog_rejects_new_analyses()
+    test_new_pushes_are_not_deduplicated_with_the_previous_head()
+    test_early_exit_cancels_remaining_analysis()
+    test_comment_posting_backs_off_on_transient_errors()
+    print("✅ GitHub service tests passed!")
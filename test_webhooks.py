@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""Test webhook signature verification"""
+
+import asyncio
+import hashlib
+import hmac
+
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.api.webhooks import (_extract_pr_event_fields, _simdjson_parser,
+                              handle_pull_request_event, verify_signature)
+from app.main import app
+
+SECRET = "webhook-secret"
+PAYLOAD = b'{"action": "opened"}'
+
+
+def sign(payload, secret=SECRET):
+    return 'sha256=' + hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+
+
+def test_valid_signature_is_accepted():
+    assert verify_signature(PAYLOAD, sign(PAYLOAD), SECRET)
+
+
+def test_wrong_or_malformed_signatures_are_rejected():
+    assert not verify_signature(PAYLOAD, sign(PAYLOAD, "other-secret"), SECRET)
+    assert not verify_signature(PAYLOAD + b" ", sign(PAYLOAD), SECRET)
+    assert not verify_signature(PAYLOAD, sign(PAYLOAD).replace('sha256=', 'sha1=  '), SECRET)
+    assert not verify_signature(PAYLOAD, 'sha256=' + 'zz' * 32, SECRET)
+    assert not verify_signature(PAYLOAD, '', SECRET)
+
+
+def test_incomplete_pull_request_payload_is_rejected():
+    data = {'action': 'opened', 'pull_request': {'number': 7, 'head': {'sha': 'a' * 40}},
+            'repository': {'full_name': 'o/r'}}
+    try:
+        asyncio.run(handle_pull_request_event(data))
+    except HTTPException as e:
+        assert e.status_code == 400
+    else:
+        raise AssertionError("expected HTTPException")
+
+    # Ignored actions are not validated at all
+    assert asyncio.run(handle_pull_request_event({'action': 'closed'})) is False
+
+
+def test_unhandled_events_are_acknowledged_without_reading_the_body():
+    client = TestClient(app)
+    response = client.post("/webhooks/github", content=b"not json",
+                           headers={'X-GitHub-Event': 'push'})
+    assert response.status_code == 200
+    assert response.json() == {"message": "Webhook processed successfully"}
+
+
+def test_simdjson_extraction_keeps_only_valid_scalar_fields():
+    if _simdjson_parser is None:
+        return  # pysimdjson is optional; the orjson path is used instead
+
+    payload = (b'{"action": "opened", "pull_request": {"number": 7, "title": "x",'
+               b' "head": {"sha": "abc", "ref": "main"}},'
+               b' "repository": {"full_name": "o/r"}, "installation": {"id": 3}}')
+    assert _extract_pr_event_fields(payload) == {
+        'action': 'opened', 'pull_request': {'number': 7, 'head': {'sha': 'abc'}},
+        'repository': {'full_name': 'o/r'}, 'installation': {'id': 3}}
+
+    # Wrong shapes leave fields out instead of raising or keeping parser proxies
+    payload = (b'{"action": "opened", "pull_request": [7], "repository": "o/r",'
+               b' "installation": {"id": {"nested": 1}}}')
+    assert _extract_pr_event_fields(payload) == {'action': 'opened'}
+
+    client = TestClient(app)
+    for payload in (payload, b'[1, 2]', b'"opened"'):
+        response = client.post("/webhooks/github", content=payload,
+                               headers={'X-GitHub-Event': 'pull_request'})
+        assert response.status_code == 400
+
+    # The shared parser is still usable afterwards
+    response = client.post("/webhooks/github", content=b'{"action": "closed"}',
+                           headers={'X-GitHub-Event': 'pull_request'})
+    assert response.status_code == 200
+
+
+if __name__ == "__main__":
+    test_valid_signature_is_accepted()
+    test_wrong_or_malformed_signatures_are_rejected()
+    test_incomplete_pull_request_payload_is_rejected()
+    test_unhandled_events_are_acknowledged_without_reading_the_body()
+    test_simdjson_extraction_keeps_only_valid_scalar_fields()
+    print("✅ Webhook tests passed!")